@@ -1,20 +1,35 @@
 # AI Shell Integration
+import sys
+import time
+
+# --startup-profile prints how long each import group and init step took
+STARTUP_PROFILE = "--startup-profile" in sys.argv
+startup_marks = [("start", time.perf_counter())]
+
+def startup_mark(label):
+    """Record a startup checkpoint (only kept with --startup-profile)."""
+    if STARTUP_PROFILE:
+        startup_marks.append((label, time.perf_counter()))
+
 import os
 import re
 # import readline
 import subprocess
 import json
-import requests
 import threading
 import queue
-import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+startup_mark("stdlib imports")
 from prompt_toolkit import PromptSession
 from prompt_toolkit.auto_suggest import AutoSuggest, Suggestion
 from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit.formatted_text import HTML
 from prompt_toolkit.styles import Style
 from prompt_toolkit.completion import Completer, Completion
+from prompt_toolkit.application import run_in_terminal
+startup_mark("prompt_toolkit")
 
 # ANSI colors for command display
 COLOR_CMD = "\033[96m"
@@ -23,10 +38,24 @@ COLOR_RESET = "\033[0m"
 # Import security configuration
 from security_config import (
     DESTRUCTIVE_PATTERNS,
-    AI_CHECK_TRIGGERS,
     SEVERITY_INFO,
     SAFE_COMMANDS
 )
+from pattern_matcher import find_destructive_patterns, find_ai_triggers
+from shell_parser import parse_command, positional_args, OVERWRITE_REDIRECTS
+from suggestion_cache import SuggestionCache, POLICIES as CACHE_POLICIES
+from suggestion_store import SuggestionStore, DEFAULT_CACHE_DIR
+from verdict_cache import VerdictCache
+from persistent_shell import PersistentShell, ShellExited
+import blast_radius
+from command_history import CommandHistory
+from command_predictor import CommandPredictor
+from async_logger import BatchLogger
+from dir_cache import DirectoryCache, DEFAULT_IGNORE
+from path_index import PathIndex
+from command_index import CommandIndex
+from metrics import Metrics, FORMATS as METRICS_FORMATS
+startup_mark("cliffy modules")
 
 # Load .env if available (optional dependency)
 try:
@@ -34,15 +63,36 @@ try:
     load_dotenv()
 except Exception:
     pass
+startup_mark("dotenv")
 
 # Global state for suggestions with caching
 current_suggestion = ""
 suggestion_lock = threading.Lock()
-suggestion_cache = {}
+# In-memory suggestion cache limits and eviction policy (lru, lfu or tinylfu)
+SUGGESTION_CACHE_MAX = int(os.getenv("CLIFFY_MEM_CACHE_ENTRIES", "1000"))
+SUGGESTION_CACHE_BYTES = int(os.getenv("CLIFFY_MEM_CACHE_BYTES", str(1024 * 1024)))
+SUGGESTION_CACHE_POLICY = os.getenv("CLIFFY_MEM_CACHE_POLICY", "lru").strip().lower()
+if SUGGESTION_CACHE_POLICY not in CACHE_POLICIES:
+    SUGGESTION_CACHE_POLICY = "lru"
+suggestion_cache = SuggestionCache(
+    max_entries=SUGGESTION_CACHE_MAX,
+    max_bytes=SUGGESTION_CACHE_BYTES,
+    policy=SUGGESTION_CACHE_POLICY
+)
 cache_lock = threading.Lock()
 last_api_call_time = 0
 api_call_lock = threading.Lock()
 MIN_API_CALL_INTERVAL = 0.1  # Minimum seconds between API calls (faster response)
+SUGGESTION_DEBOUNCE = 0.15  # Seconds the buffer must stay unchanged before hitting the API
+suggestion_generation = 0  # Bumped on every buffer change; only the newest may publish
+suggestion_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cliffy-suggest")
+# Concurrent file generation in %%% once the whole plan is approved
+CODEGEN_WORKERS = max(1, int(os.getenv("CLIFFY_CODEGEN_WORKERS", "4")))
+MAX_PLAN_FILES = 6  # Larger %%% plans need an extra confirmation
+# Independent %%% preparation calls (intent, filename, file plan) run side by side
+prep_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="cliffy-prep")
+# Speculative %% work: explanations and AI safety verdicts for upcoming steps
+prefetch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cliffy-prefetch")
 
 class AIAutoSuggest(AutoSuggest):
     """Custom AutoSuggest class for AI-powered command completion."""
@@ -54,33 +104,128 @@ class AIAutoSuggest(AutoSuggest):
         with suggestion_lock:
             suggestion = current_suggestion
         
-        log_message(f"AIAutoSuggest: typed='{typed_text}', current_suggestion='{suggestion}'", "DEBUG")
+        log_message("AIAutoSuggest lookup", "DEBUG", typed=typed_text, suggestion=suggestion)
             
         if suggestion and suggestion.startswith(typed_text) and suggestion != typed_text:
             result = Suggestion(suggestion[len(typed_text):])
-            log_message(f"AIAutoSuggest: returning '{result.text}'", "DEBUG")
+            log_message("AIAutoSuggest returning", "DEBUG", text=result.text)
             return result
         return None
 
+def next_suggestion_generation():
+    """Start a new suggestion generation, superseding every in-flight request."""
+    global suggestion_generation
+    with suggestion_lock:
+        suggestion_generation += 1
+        return suggestion_generation
+
+def is_stale_generation(generation):
+    """True once a newer buffer change has superseded this generation."""
+    return generation is not None and generation != suggestion_generation
+
+def publish_suggestion(suggestion, generation=None, session=None):
+    """Set current_suggestion unless a newer generation has superseded this request."""
+    global current_suggestion
+    with suggestion_lock:
+        if is_stale_generation(generation):
+            return False
+        current_suggestion = suggestion
+    if session is not None:
+        refresh_ghost_text(session)
+    return True
+
+def refresh_ghost_text(session):
+    """Re-run auto-suggestion on the live buffer so a new current_suggestion shows at once.
+
+    prompt_toolkit only queries AutoSuggest on text changes; invalidate() alone
+    would leave the old ghost text until the next keystroke.
+    """
+    app = session.app
+    if not app or not app.is_running or app.loop is None:
+        return
+    
+    def apply():
+        buffer = session.default_buffer
+        if session.auto_suggest is not None:
+            buffer.suggestion = session.auto_suggest.get_suggestion(buffer, buffer.document)
+        app.invalidate()
+    
+    app.loop.call_soon_threadsafe(apply)
+
 def get_cached_suggestion_for(text):
-    """Return a cached suggestion that still matches the current text."""
-    best_suggestion = ""
-    best_key_len = -1
+    """Return a cached suggestion that still matches the current text.
+
+    Exact match first, then the suggestion of the longest cached key that
+    still extends the text (a trie lookup, see suggestion_cache.py).
+    """
     with cache_lock:
-        # Exact match first
-        if text in suggestion_cache:
-            return suggestion_cache[text]
-        # Fallback: reuse a cached suggestion from a shorter prefix
-        for key, suggestion in suggestion_cache.items():
-            if not suggestion:
-                continue
-            if suggestion.startswith(text) and len(key) > best_key_len:
-                best_suggestion = suggestion
-                best_key_len = len(key)
-    return best_suggestion
+        return suggestion_cache.lookup(text)
+
+def clean_suggestion_text(raw):
+    """Reduce a raw model completion to a single candidate command line."""
+    suggestion = raw.strip().split("\n")[0].split("#")[0].strip()
+    suggestion = suggestion.strip('"').strip("'")
+    
+    if " - " in suggestion:
+        suggestion = suggestion.split(" - ")[0].strip()
+    return suggestion
+
+def is_prefix_compatible(partial, typed_text):
+    """True while a partial completion and the typed text agree on their common prefix."""
+    n = min(len(partial), len(typed_text))
+    return partial[:n] == typed_text[:n]
+
+def stream_suggestion(user_input, on_partial, get_typed_text=None, is_stale=None):
+    """Stream a completion, publishing partial suggestions as tokens arrive.
+
+    Returns (suggestion, complete). complete is False when the stream was
+    dropped because the received text no longer matches what is typed or
+    the request was superseded.
+    """
+    received = ""
+    suggestion = ""
+    stream = call_ai_api_stream(
+        f"Complete this shell command (respond with only the completed command, no explanations): {user_input}",
+        call_type="autosuggest"
+    )
+    try:
+        for delta in stream:
+            if is_stale is not None and is_stale():
+                log_message("Cancelled suggestion stream", "DEBUG", input=user_input)
+                metrics.observe_cancel("autosuggest")
+                return "", False
+            received += delta
+            partial = clean_suggestion_text(received)
+            typed_text = get_typed_text() if get_typed_text else user_input
+            
+            # Drop the stream as soon as the model diverges from what is typed
+            if not is_prefix_compatible(partial, user_input) or not is_prefix_compatible(partial, typed_text):
+                log_message("Dropping suggestion stream", "DEBUG", input=user_input, partial=partial)
+                metrics.observe_cancel("autosuggest")
+                return "", typed_text == user_input
+            
+            if partial.startswith(typed_text) and partial != typed_text and partial != suggestion:
+                suggestion = partial
+                on_partial(suggestion)
+            
+            # Only the first line is used, so stop once it is complete
+            if "\n" in received.strip():
+                break
+    finally:
+        stream.close()
+    
+    suggestion = clean_suggestion_text(received)
+    if not suggestion or not suggestion.startswith(user_input) or suggestion == user_input:
+        suggestion = ""
+    return suggestion, True
+
+def get_ai_suggestion(user_input, on_partial=None, get_typed_text=None, is_stale=None):
+    """Get command completion suggestions with caching.
 
-def get_ai_suggestion(user_input):
-    """Get command completion suggestions with caching."""
+    When on_partial is given and streaming is enabled, partial suggestions
+    are passed to it as tokens arrive. is_stale lets a superseded request
+    bail out before (or while) it talks to the API.
+    """
     global last_api_call_time
     
     try:
@@ -90,113 +235,159 @@ def get_ai_suggestion(user_input):
         # Check cache first
         cached = get_cached_suggestion_for(user_input)
         if cached:
-            log_message(f"Cache hit for: {user_input}", "DEBUG")
+            log_message("Cache hit", "DEBUG", input=user_input)
             return cached
 
-        # Rate limiting to prevent too many API calls
+        # Rate limiting to prevent too many API calls: reserve a slot under the
+        # lock, then sleep outside it so a stale request never blocks newer ones
         with api_call_lock:
             current_time = time.time()
-            time_since_last_call = current_time - last_api_call_time
-            if time_since_last_call < MIN_API_CALL_INTERVAL:
-                time.sleep(MIN_API_CALL_INTERVAL - time_since_last_call)
-            last_api_call_time = time.time()
+            wait = max(0.0, last_api_call_time + MIN_API_CALL_INTERVAL - current_time)
+            last_api_call_time = current_time + wait
+        if wait:
+            time.sleep(wait)
+        if is_stale is not None and is_stale():
+            return ""
 
-        log_message(f"Requesting suggestion for: {user_input}", "DEBUG")
-        
-        # Better prompt instead of just "Complete: {input}"
-        suggestion = call_ai_api(f"Complete this shell command (respond with only the completed command, no explanations): {user_input}")
-        
-        # Clean the response
-        suggestion = suggestion.strip().split("\n")[0].split("#")[0].strip()
-        suggestion = suggestion.strip('"').strip("'")
-        
-        if " - " in suggestion:
-            suggestion = suggestion.split(" - ")[0].strip()
+        log_message("Requesting suggestion", "DEBUG", input=user_input)
         
-        # Validate
-        if not suggestion or not suggestion.startswith(user_input) or suggestion == user_input:
-            suggestion = ""
+        if on_partial is not None and STREAM_SUGGESTIONS:
+            suggestion, complete = stream_suggestion(user_input, on_partial, get_typed_text, is_stale)
+            if not complete:
+                return suggestion
+        else:
+            # Better prompt instead of just "Complete: {input}"
+            suggestion = call_ai_api(f"Complete this shell command (respond with only the completed command, no explanations): {user_input}", call_type="autosuggest")
+            suggestion = clean_suggestion_text(suggestion)
+            
+            # Validate
+            if not suggestion or not suggestion.startswith(user_input) or suggestion == user_input:
+                suggestion = ""
         
-        # Cache the result
+        # Cache the result (the cache enforces its own size limits)
         with cache_lock:
             suggestion_cache[user_input] = suggestion
-            # Keep cache size manageable
-            if len(suggestion_cache) > 100:
-                oldest_keys = list(suggestion_cache.keys())[:20]
-                for key in oldest_keys:
-                    del suggestion_cache[key]
+        if suggestion_store is not None:
+            suggestion_store.put(user_input, suggestion)
         
         return suggestion
         
     except Exception as e:
         return ""
 
-def fetch_suggestion_async(text, session):
-    """Fetch suggestions asynchronously with debouncing."""
-    global current_suggestion
+def fetch_suggestion_async(text, session, generation=None, fallback=""):
+    """Fetch a suggestion for text in a worker thread and publish it if still current.
+
+    fallback (a local prediction) is kept when the API returns nothing.
+    """
+    if is_stale_generation(generation):
+        return
+    
+    log_message("Fetching suggestion", "DEBUG", input=text)
+    suggestion = get_ai_suggestion(
+        text,
+        on_partial=lambda partial: publish_suggestion(partial, generation, session),
+        get_typed_text=lambda: session.default_buffer.document.text,
+        is_stale=lambda: is_stale_generation(generation)
+    )
+    log_message("Got suggestion", "DEBUG", suggestion=suggestion)
+    if not suggestion and fallback:
+        suggestion = fallback
     
+    if publish_suggestion(suggestion, generation, session):
+        log_message("Updated current_suggestion", "DEBUG", suggestion=suggestion)
+    else:
+        log_message("Discarded stale suggestion", "DEBUG", input=text)
+
+async def suggestion_pipeline(text, generation, session):
+    """Per-keystroke suggestion task on prompt_toolkit's event loop.
+
+    Cache hits are published immediately; API requests wait out the debounce
+    window so that a newer keystroke can cancel them before they start.
+    """
     if len(text.strip()) < 2:
-        with suggestion_lock:
-            current_suggestion = ""
+        publish_suggestion("", generation, session)
         return
     
     # Skip if command seems complete
     if text.endswith(" ") and len(text.strip().split()) >= 2:
-        with suggestion_lock:
-            current_suggestion = ""
+        publish_suggestion("", generation, session)
         return
 
+    # Commands already run locally answer instantly and never hit the API
+    if HISTORY_SUGGESTIONS:
+        try:
+            cwd = os.getcwd()
+        except OSError:
+            cwd = None  # Directory was deleted; rank without the directory boost
+        local = command_history.suggest(text, cwd)
+        if local:
+            log_message("History suggestion", "DEBUG", input=text, suggestion=local)
+            publish_suggestion(local, generation, session)
+            return
+
     # Reuse cached/previous suggestions when possible
     cached = get_cached_suggestion_for(text)
     if cached:
-        with suggestion_lock:
-            current_suggestion = cached
-        if session.app:
-            session.app.invalidate()
+        publish_suggestion(cached, generation, session)
         return
     with suggestion_lock:
         if current_suggestion and current_suggestion.startswith(text):
             return
     
-    log_message(f"Fetching suggestion for: '{text}'", "DEBUG")
-    suggestion = get_ai_suggestion(text)
-    log_message(f"Got suggestion: '{suggestion}'", "DEBUG")
-    
-    with suggestion_lock:
-        current_suggestion = suggestion
-    
-    if session.app:
-        session.app.invalidate()
+    # Local n-gram prediction: confident ones skip the API, weaker ones show
+    # while the request is in flight and remain if the API gives nothing back
+    predicted = ""
+    if PREDICTOR_SUGGESTIONS:
+        predicted, confidence = command_predictor.predict(text)
+        if predicted:
+            log_message("Predicted suggestion", "DEBUG", input=text, suggestion=predicted, confidence=confidence)
+            publish_suggestion(predicted, generation, session)
+            if confidence >= PREDICTOR_CONFIDENCE:
+                return
     
-    log_message(f"Updated current_suggestion to: '{current_suggestion}'", "DEBUG")
+    await asyncio.sleep(SUGGESTION_DEBOUNCE)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        suggestion_executor, fetch_suggestion_async, text, session, generation, predicted
+    )
 
 class FileCompleter(Completer):
-    """File and directory completer for prompt_toolkit"""
+    """File and directory completer for prompt_toolkit (listings cached in dir_cache)"""
     
     def get_completions(self, document, complete_event):
         text = document.text_before_cursor
         
-        # Get the word being completed
-        word = text.split()[-1] if text.split() else ""
+        # Get the word being completed (none right after a space)
+        word = text.split()[-1] if text.split() and not text[-1].isspace() else ""
+        
+        # Command position: complete executables from $PATH before files
+        if word and COMMAND_POSITION.search(text[:len(text) - len(word)]) and not word.startswith(('%', '.', '~', '$')) and '/' not in word:
+            for name in command_index.complete(word, COMPLETION_LIMIT):
+                yield Completion(name, start_position=-len(word), display_meta="command")
+        
+        if path_index is not None and word.startswith('**'):
+            yield from self.fuzzy_completions(word, word[2:])
+            return
         
+        dirname, basename = os.path.split(word)
+        found = False
         try:
-            if word:
-                dirname = os.path.dirname(word) or '.'
-                basename = os.path.basename(word)
-            else:
-                dirname = '.'
-                basename = ''
-            
-            if os.path.isdir(dirname):
-                for item in os.listdir(dirname):
-                    if item.startswith(basename):
-                        full_path = os.path.join(dirname, item)
-                        if os.path.isdir(full_path):
-                            yield Completion(item + '/', start_position=-len(basename))
-                        else:
-                            yield Completion(item, start_position=-len(basename))
-        except (OSError, PermissionError):
+            for entry in dir_cache.complete(os.path.expanduser(dirname or '.'), basename, COMPLETION_LIMIT):
+                found = True
+                yield Completion(entry.name + '/' if entry.is_dir else entry.name,
+                                 start_position=-len(basename))
+        except OSError:
             pass
+        
+        # Nothing matched literally: fall back to fuzzy matches under the cwd
+        if path_index is not None and not found and len(word) >= 2 and word[0] not in '~/$-':
+            yield from self.fuzzy_completions(word, word)
+    
+    def fuzzy_completions(self, word, query):
+        path_index.set_root(os.getcwd())
+        for path in path_index.query(query, COMPLETION_LIMIT):
+            yield Completion(path, start_position=-len(word), display_meta="fuzzy")
 
 # Configuration
 API_KEY = os.getenv("GROQ_API_KEY", "").strip()
@@ -204,38 +395,278 @@ API_ENDPOINT = os.getenv("GROQ_API_ENDPOINT", "https://api.groq.com/openai/v1").
 MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant").strip()
 HISTORY_FILE = os.path.expanduser("~/.ai_shell_history")
 LOG_FILE = os.path.expanduser("~/.ai_shell.log")
+# Log threshold (DEBUG, INFO, WARNING, ERROR) and line format (text or json)
+LOG_LEVEL = os.getenv("CLIFFY_LOG_LEVEL", "INFO").strip().upper()
+LOG_FORMAT = os.getenv("CLIFFY_LOG_FORMAT", "text").strip().lower()
+logger = BatchLogger(LOG_FILE, level=LOG_LEVEL, fmt=LOG_FORMAT)
+# Stream ghost-text tokens as they arrive (set CLIFFY_STREAM_SUGGESTIONS=0 to disable)
+STREAM_SUGGESTIONS = os.getenv("CLIFFY_STREAM_SUGGESTIONS", "1").strip() != "0"
+# Persistent suggestion cache shared across sessions (set CLIFFY_PERSIST_CACHE=0 to disable)
+PERSIST_SUGGESTIONS = os.getenv("CLIFFY_PERSIST_CACHE", "1").strip() != "0"
+SUGGESTION_DB = os.path.join(DEFAULT_CACHE_DIR, "suggestions.db")
+SUGGESTION_TTL = int(os.getenv("CLIFFY_CACHE_TTL", str(7 * 24 * 3600)))
+SUGGESTION_DB_MAX_ENTRIES = int(os.getenv("CLIFFY_CACHE_MAX_ENTRIES", "5000"))
+SUGGESTION_CWD_CONTEXT = os.getenv("CLIFFY_CACHE_CWD_CONTEXT", "0").strip() == "1"
+
+# Reuse AI safety verdicts for commands of the same shape (set CLIFFY_VERDICT_CACHE=0 to disable)
+VERDICT_CACHE = os.getenv("CLIFFY_VERDICT_CACHE", "1").strip() != "0"
+VERDICT_DB = os.path.join(DEFAULT_CACHE_DIR, "verdicts.db")
+VERDICT_TTL = int(os.getenv("CLIFFY_VERDICT_TTL", str(24 * 3600)))
 
 # Security patterns now loaded from security_config.py
 # This provides a comprehensive, centralized list of destructive command patterns
 
-# Initialize history file
-Path(HISTORY_FILE).touch(exist_ok=True)
+# Serve suggestions from executed-command history before asking the AI
+HISTORY_SUGGESTIONS = os.getenv("CLIFFY_HISTORY_SUGGESTIONS", "1").strip() != "0"
+
+# Local n-gram predictions; at or above this confidence the API is skipped
+PREDICTOR_SUGGESTIONS = os.getenv("CLIFFY_PREDICTOR_SUGGESTIONS", "1").strip() != "0"
+PREDICTOR_CONFIDENCE = float(os.getenv("CLIFFY_PREDICTOR_CONFIDENCE", "0.8"))
+
+# Initialize history file (owner-only: it holds every command run and its cwd)
+command_history = CommandHistory(HISTORY_FILE)
+command_history.ensure_file()
+command_predictor = CommandPredictor()
+
+suggestion_store = None
+if PERSIST_SUGGESTIONS:
+    suggestion_store = SuggestionStore(
+        SUGGESTION_DB,
+        MODEL,
+        ttl=SUGGESTION_TTL,
+        max_entries=SUGGESTION_DB_MAX_ENTRIES,
+        use_cwd_context=SUGGESTION_CWD_CONTEXT
+    )
+
+verdict_cache = VerdictCache(VERDICT_DB, MODEL, ttl=VERDICT_TTL) if VERDICT_CACHE else None
+
+# Commands run in one long-lived bash (set CLIFFY_PERSISTENT_SHELL=0 for a bash -c per command)
+PERSISTENT_SHELL = os.getenv("CLIFFY_PERSISTENT_SHELL", "1").strip() != "0"
+SHELL_RC = os.path.expanduser(os.getenv("CLIFFY_SHELL_RC", "").strip()) or None
+persistent_shell = PersistentShell(rcfile=SHELL_RC) if PERSISTENT_SHELL else None
+
+# Path completion: cached directory listings, at most COMPLETION_LIMIT results per keystroke
+COMPLETION_LIMIT = max(1, int(os.getenv("CLIFFY_COMPLETION_LIMIT", "200")))
+COMPLETION_IGNORE = [p.strip() for p in os.getenv("CLIFFY_COMPLETION_IGNORE", ",".join(DEFAULT_IGNORE)).split(",") if p.strip()]
+dir_cache = DirectoryCache(ignore=COMPLETION_IGNORE)
+# Optional fuzzy path completion from a background index of the cwd tree
+FUZZY_PATHS = os.getenv("CLIFFY_FUZZY_PATHS", "0").strip() == "1"
+FUZZY_MAX_ENTRIES = int(os.getenv("CLIFFY_FUZZY_MAX_ENTRIES", "250000"))
+path_index = PathIndex(max_entries=FUZZY_MAX_ENTRIES) if FUZZY_PATHS else None
+# Executables on $PATH for completing the command word (built at startup, like bash's hash table)
+command_index = CommandIndex()
+COMMAND_POSITION = re.compile(r'(?:^|[|;&(]|\bsudo|\btime|\bwatch|\bxargs|\bnohup)\s*$')
+
+# In-process metrics, shown by `status` and optionally exported to a file for scraping
+METRICS_FILE = os.path.expanduser(os.getenv("CLIFFY_METRICS_FILE", "").strip().replace("{pid}", str(os.getpid())))
+METRICS_FORMAT = os.getenv("CLIFFY_METRICS_FORMAT", "").strip().lower() or ("json" if METRICS_FILE.endswith(".json") else "prometheus")
+METRICS_INTERVAL = max(1.0, float(os.getenv("CLIFFY_METRICS_INTERVAL", "15")))
+metrics = Metrics()
+metrics.register_cache("suggestions", lambda: (suggestion_cache.hits, suggestion_cache.misses))
+metrics.register_cache("path_listings", lambda: (dir_cache.hits, dir_cache.misses))
+if verdict_cache is not None:
+    metrics.register_cache("safety_verdicts", lambda: (verdict_cache.hits, verdict_cache.misses))
 
 # Global connection status
-api_connection_status = {"connected": False, "last_check": 0, "error_message": ""}
+api_connection_status = {"connected": False, "last_check": 0, "error_message": "", "checking": False}
+
+# Shared HTTP client: keep-alive connections to API_ENDPOINT reused by every call
+HTTP_POOL_SIZE = 8
+http_session = None
+http_session_lock = threading.Lock()
+startup_mark("module state")
 
-def log_message(message, level="INFO"):
-    """Log messages to file with timestamp"""
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] [{level}] {message}\n"
+def log_message(message, level="INFO", **fields):
+    """Queue a log record for the background writer.
+    
+    Keyword fields are logged as structured data (key=value, or JSON keys
+    with CLIFFY_LOG_FORMAT=json). Records below CLIFFY_LOG_LEVEL return
+    immediately, so pass values as fields rather than pre-formatting them.
+    """
+    logger.log(level, message, fields or None)
+
+def get_http_session():
+    """Return the process-wide requests.Session (created on first use)."""
+    global http_session
+    with http_session_lock:
+        if http_session is None:
+            import http_pool  # Deferred: requests is the slowest import at startup
+            http_session = http_pool.create_session(API_KEY, HTTP_POOL_SIZE)
+        return http_session
+
+def connect_timing():
+    """Thread-local connect() timing of the shared pool."""
+    import http_pool
+    return http_pool.connect_timing
+
+def post_chat_completion(data, timeout=10, call_type="chat"):
+    """POST to /chat/completions over the shared pool and log connect/TTFB timings.
+
+    Exceptions from requests are propagated so callers keep their own handling.
+    """
+    import http_pool
+    session = get_http_session()
+    timing = connect_timing()
+    timing.seconds = None
+    start = time.perf_counter()
     try:
-        with open(LOG_FILE, "a") as f:
-            f.write(log_entry)
-    except Exception:
-        pass  # Silent fail if logging doesn't work
+        response = session.post(f"{API_ENDPOINT}/chat/completions", json=data, timeout=timeout)
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        metrics.observe_request(call_type, elapsed, error=True, timeout=http_pool.is_timeout(e))
+        log_message("HTTP failed", "DEBUG", call=call_type, total_ms=round(elapsed * 1000), error=type(e).__name__)
+        raise
+    total_ms = (time.perf_counter() - start) * 1000
+    metrics.observe_request(
+        call_type, total_ms / 1000,
+        error=response.status_code != 200,
+        bytes_sent=len(response.request.body or b""),
+        bytes_received=http_pool.bytes_received(response),
+    )
+    ttfb_ms = response.elapsed.total_seconds() * 1000
+    connect_seconds = timing.seconds
+    log_message(
+        "HTTP", "DEBUG",
+        call=call_type,
+        status=response.status_code,
+        connect_ms="reused" if connect_seconds is None else round(connect_seconds * 1000),
+        ttfb_ms=round(ttfb_ms),
+        total_ms=round(total_ms),
+    )
+    return response
+
+def iter_response_lines(response):
+    """Yield decoded lines from a streamed response as soon as each one arrives."""
+    raw = response.raw
+    pending = b""
+    while True:
+        chunk = raw.read1(8192) if hasattr(raw, "read1") else raw.read(1)
+        if not chunk:
+            break
+        pending += chunk
+        while b"\n" in pending:
+            line, pending = pending.split(b"\n", 1)
+            yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+    if pending:
+        yield pending.decode("utf-8", errors="replace")
+
+def stream_chat_completion(data, timeout=10, call_type="chat"):
+    """Yield content deltas from a streaming (SSE) /chat/completions request.
+
+    Closing the generator early drops the underlying connection.
+    """
+    import requests
+    import http_pool
+    session = get_http_session()
+    timing = connect_timing()
+    timing.seconds = None
+    start = time.perf_counter()
+    first_token_ms = None
+    try:
+        response = session.post(
+            f"{API_ENDPOINT}/chat/completions",
+            json=dict(data, stream=True),
+            timeout=timeout,
+            stream=True
+        )
+    except Exception as e:
+        metrics.observe_request(call_type, time.perf_counter() - start, error=True, timeout=http_pool.is_timeout(e))
+        raise
+    error = None
+    try:
+        if response.status_code != 200:
+            raise requests.HTTPError(f"API Error: {response.status_code}", response=response)
+        for line in iter_response_lines(response):
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            try:
+                chunk = json.loads(payload)
+            except ValueError:
+                continue
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            delta = (choices[0].get("delta") or {}).get("content") or ""
+            if delta:
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                yield delta
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        received = http_pool.bytes_received(response)
+        response.close()
+        total_ms = (time.perf_counter() - start) * 1000
+        # Ghost text appears with the first token, so that is the latency that matters
+        metrics.observe_request(
+            call_type, (total_ms if first_token_ms is None else first_token_ms) / 1000,
+            error=error is not None,
+            timeout=error is not None and http_pool.is_timeout(error),
+            bytes_sent=len(response.request.body or b""),
+            bytes_received=received,
+        )
+        connect_seconds = timing.seconds
+        log_message(
+            "HTTP stream", "DEBUG",
+            call=call_type,
+            status=response.status_code,
+            connect_ms="reused" if connect_seconds is None else round(connect_seconds * 1000),
+            ttfb_ms=round(response.elapsed.total_seconds() * 1000),
+            first_token_ms="none" if first_token_ms is None else round(first_token_ms),
+            total_ms=round(total_ms),
+        )
+
+def load_persistent_suggestions():
+    """Warm the in-memory suggestion cache from the on-disk store."""
+    if suggestion_store is None:
+        return 0
+    try:
+        rows = suggestion_store.load(SUGGESTION_CACHE_MAX)
+    except Exception as e:
+        log_message(f"Could not load suggestion cache from {SUGGESTION_DB}: {e}", "WARNING")
+        return 0
+    with cache_lock:
+        # Oldest first so the most recent entries are the last to be evicted
+        for prefix, suggestion in reversed(rows):
+            suggestion_cache[prefix] = suggestion
+    log_message(f"Loaded {len(rows)} cached suggestions from {SUGGESTION_DB}", "INFO")
+    return len(rows)
+
+def load_local_models():
+    """Load command history and train the n-gram predictor from it."""
+    start = time.perf_counter()
+    commands = command_history.load()
+    command_predictor.train(commands)
+    log_message(
+        f"Loaded {len(commands)} history entries in {(time.perf_counter() - start) * 1000:.0f}ms",
+        "INFO"
+    )
+
+def test_api_connection(quiet=False):
+    """Test the API connection and log the result.
+    
+    With quiet=True nothing is printed (used by the startup probe, which runs
+    in the background while the prompt is already up); the outcome is only
+    recorded in api_connection_status.
+    """
+    api_connection_status["checking"] = True
+    try:
+        return _probe_api_connection(print if not quiet else (lambda *args: None))
+    finally:
+        api_connection_status["checking"] = False
 
-def test_api_connection():
-    """Test the API connection and log the result"""
+def _probe_api_connection(say):
+    import requests
     log_message("Testing API connection...", "INFO")
-    print("🔄 Testing AI API connection...")
+    say("🔄 Testing AI API connection...")
     
     try:
         if not API_KEY:
             raise ValueError("GROQ_API_KEY is not set")
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {API_KEY}"
-        }
         data = {
             "model": MODEL,
             "messages": [
@@ -251,8 +682,7 @@ def test_api_connection():
             "max_tokens": 10
         }
         
-        response = requests.post(f"{API_ENDPOINT}/chat/completions", 
-                               headers=headers, json=data, timeout=10)
+        response = post_chat_completion(data, timeout=10, call_type="connection_test")
         
         if response.status_code == 200:
             result = response.json()
@@ -260,7 +690,7 @@ def test_api_connection():
             api_connection_status["last_check"] = time.time()
             api_connection_status["error_message"] = ""
             log_message("✓ API connection successful", "INFO")
-            print("✅ AI API connected successfully!")
+            say("✅ AI API connected successfully!")
             return True
         else:
             error_msg = f"HTTP {response.status_code}: {response.text[:100]}"
@@ -268,7 +698,7 @@ def test_api_connection():
             api_connection_status["last_check"] = time.time()
             api_connection_status["error_message"] = error_msg
             log_message(f"✗ API connection failed: {error_msg}", "ERROR")
-            print(f"❌ AI API connection failed: {error_msg}")
+            say(f"❌ AI API connection failed: {error_msg}")
             return False
             
     except requests.exceptions.Timeout:
@@ -277,7 +707,7 @@ def test_api_connection():
         api_connection_status["last_check"] = time.time()
         api_connection_status["error_message"] = error_msg
         log_message(f"✗ API connection timeout", "ERROR")
-        print(f"❌ AI API connection timeout")
+        say(f"❌ AI API connection timeout")
         return False
         
     except requests.exceptions.ConnectionError:
@@ -286,7 +716,7 @@ def test_api_connection():
         api_connection_status["last_check"] = time.time()
         api_connection_status["error_message"] = error_msg
         log_message(f"✗ Network connection error", "ERROR")
-        print(f"❌ Network connection error")
+        say(f"❌ Network connection error")
         return False
         
     except Exception as e:
@@ -295,19 +725,12 @@ def test_api_connection():
         api_connection_status["last_check"] = time.time()
         api_connection_status["error_message"] = error_msg
         log_message(f"✗ API connection error: {error_msg}", "ERROR")
-        print(f"❌ AI API error: {error_msg}")
+        say(f"❌ AI API error: {error_msg}")
         return False
 
-def call_ai_api(prompt):
-    """Make API call with better prompts for more specific responses"""
-    if not API_KEY:
-        log_message("GROQ_API_KEY is not set", "ERROR")
-        return ""
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {API_KEY}"
-    }
-    data = {
+def build_chat_request(prompt, max_tokens=150):
+    """Build the chat completion payload shared by streaming and non-streaming calls."""
+    return {
         "model": MODEL,
         "messages": [
             {
@@ -319,12 +742,18 @@ def call_ai_api(prompt):
                 "content": prompt
             }
         ],
-        "max_tokens": 150
+        "max_tokens": max_tokens
     }
+
+def call_ai_api(prompt, call_type="chat"):
+    """Make API call with better prompts for more specific responses"""
+    if not API_KEY:
+        log_message("GROQ_API_KEY is not set", "ERROR")
+        return ""
+    data = build_chat_request(prompt)
     
     try:
-        response = requests.post(f"{API_ENDPOINT}/chat/completions", 
-                               headers=headers, json=data, timeout=10)
+        response = post_chat_completion(data, timeout=10, call_type=call_type)
         
         if response.status_code == 200:
             result = response.json()
@@ -346,6 +775,25 @@ def call_ai_api(prompt):
         api_connection_status["error_message"] = error_msg
         return ""
 
+def call_ai_api_stream(prompt, call_type="chat"):
+    """Streaming variant of call_ai_api(): yields content deltas as they arrive."""
+    if not API_KEY:
+        log_message("GROQ_API_KEY is not set", "ERROR")
+        return
+    deltas = stream_chat_completion(build_chat_request(prompt), timeout=10, call_type=call_type)
+    try:
+        for delta in deltas:
+            yield delta
+        api_connection_status["connected"] = True
+        api_connection_status["error_message"] = ""
+    except Exception as e:
+        error_msg = f"Request failed: {str(e)}"
+        log_message(f"API stream exception: {error_msg}", "ERROR")
+        api_connection_status["connected"] = False
+        api_connection_status["error_message"] = error_msg
+    finally:
+        deltas.close()
+
 
 def suggest_command_threaded(task):
     """Get command suggestion from AI using threading"""
@@ -365,7 +813,139 @@ def suggest_command_threaded(task):
     except queue.Empty:
         return "Suggestion timed out"
 
-def check_command_safety(cmd):
+def ai_safety_verdict(cmd, quiet=False):
+    """Stage 2 verdict for cmd: (AI response, True if it came from the verdict cache)."""
+    cached_verdict = verdict_cache.get(cmd) if verdict_cache is not None else None
+    if cached_verdict:
+        verdict, safety_response = cached_verdict
+        log_message(f"Safety verdict cache hit ({verdict}): {cmd}", "INFO")
+        return safety_response, True
+    
+    log_message(f"Sending command for AI safety analysis: {cmd}", "INFO")
+    if not quiet:
+        print("🤖 Running AI safety analysis...")
+    safety_response = call_ai_api(
+        f"Analyze this command for destructiveness. Respond ONLY with: SAFE or DANGEROUS: <one sentence reason>\nCommand: {cmd}",
+        call_type="safety"
+    )
+    if verdict_cache is not None and safety_response:
+        # Only conclusive answers are worth remembering
+        if "DANGEROUS" in safety_response.upper():
+            verdict_cache.put(cmd, "DANGEROUS", safety_response)
+        elif "SAFE" in safety_response.upper():
+            verdict_cache.put(cmd, "SAFE", safety_response)
+    return safety_response, False
+
+def needs_ai_safety_check(cmd):
+    """True if cmd would reach the AI stage on its text alone (no pattern hit, has a trigger)."""
+    analysis = parse_command(cmd.strip()).analysis_text()
+    return bool(find_ai_triggers(analysis)) and not find_destructive_patterns(analysis)
+
+class StepPrefetcher:
+    """Per-task cache of step explanations and AI safety verdicts.
+    
+    As soon as a %% plan is known, the batched explanation and the AI
+    verdicts for every step are requested in the background, so each
+    confirmation prompt finds them ready. Only text-derived results are
+    prefetched; file-system checks (blast radius, overwrites) still run at
+    confirmation time because earlier steps may change the tree. Entries
+    are keyed by step text, so an edited step is invalidated and refetched.
+    """
+    
+    def __init__(self, steps):
+        self._lock = threading.Lock()
+        self._explanations = {}   # step -> future of {step: explanation}
+        self._resolved = {}       # step -> explanation text
+        self._verdicts = {}       # stripped step -> future of (response, from_cache)
+        batch = prefetch_executor.submit(explain_steps, steps)
+        for step in steps:
+            self._explanations[step] = batch
+        self._prefetch_verdicts(steps)
+    
+    def _prefetch_verdicts(self, steps):
+        for step in steps:
+            key = step.strip()
+            if key not in self._verdicts and needs_ai_safety_check(key):
+                self._verdicts[key] = prefetch_executor.submit(ai_safety_verdict, key, True)
+    
+    def prefetch(self, step):
+        """Start fetching the explanation and verdict for a new (edited) step."""
+        with self._lock:
+            if step not in self._explanations and step not in self._resolved:
+                self._explanations[step] = prefetch_executor.submit(
+                    lambda: {step: explain_command(step)}
+                )
+            self._prefetch_verdicts([step])
+    
+    def invalidate(self, step):
+        """Forget everything prefetched for step (called when the user edits it)."""
+        with self._lock:
+            # The batch future is shared with the other steps, so it is only dropped
+            self._explanations.pop(step, None)
+            self._resolved.pop(step, None)
+            verdict = self._verdicts.pop(step.strip(), None)
+        if verdict is not None:
+            verdict.cancel()
+    
+    def explanation(self, step):
+        """Explanation for step, waiting for the prefetch if it is still running."""
+        with self._lock:
+            if step in self._resolved:
+                return self._resolved[step]
+            future = self._explanations.get(step)
+        text = None
+        if future is not None:
+            try:
+                text = future.result().get(step)
+            except Exception as e:
+                log_message(f"Explanation prefetch failed: {e}", "ERROR")
+        if not text:
+            # Missing from the batch, or never prefetched
+            text = explain_command(step)
+        with self._lock:
+            self._resolved[step] = text
+        return text
+    
+    def safety_verdict(self, step):
+        """Prefetched (response, from_cache) for step, or None if there is none."""
+        with self._lock:
+            future = self._verdicts.get(step.strip())
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            log_message(f"Safety verdict prefetch failed: {e}", "ERROR")
+            return None
+    
+    def close(self):
+        """Cancel whatever has not started yet."""
+        with self._lock:
+            futures = set(self._explanations.values()) | set(self._verdicts.values())
+            self._explanations.clear()
+            self._resolved.clear()
+            self._verdicts.clear()
+        for future in futures:
+            future.cancel()
+
+def check_command_safety(cmd, prefetcher=None):
+    """Run the safety checks on cmd; True if it may run.
+    
+    Time spent in the checks is recorded, minus the time the user takes to
+    answer confirmation prompts.
+    """
+    timer = metrics.timer("check_command_safety")
+    try:
+        return run_safety_checks(cmd, prefetcher, timer)
+    finally:
+        timer.stop()
+
+def confirm_action(timer, prompt="⚙️  Do you want to proceed? (y/n): "):
+    """Ask for confirmation without counting the wait against the safety check."""
+    with timer.paused():
+        return input(prompt).lower() == "y"
+
+def run_safety_checks(cmd, prefetcher, timer):
     """
     Two-stage safety check:
     STAGE 1: Fast pattern-based detection for known destructive commands
@@ -374,18 +954,22 @@ def check_command_safety(cmd):
     IMPORTANT: Safe command whitelist is NOT used to bypass checks.
     We check for dangerous patterns/operators FIRST, regardless of the base command.
     """
-    # Handle sudo commands by extracting the actual command
-    actual_cmd = cmd
-    if cmd.strip().startswith('sudo '):
-        actual_cmd = cmd.strip()[5:]  # Remove 'sudo ' prefix
+    # Parse once (memoized): segments, operators, redirections and sudo/env
+    # prefixes all come from the same quote-aware structure
+    parsed = parse_command(cmd.strip())
+    if parsed.uses_sudo:
         print("⚠️  WARNING: Running command with sudo privileges!")
     
+    # Patterns are matched against the command with comments and quoted data
+    # arguments (echo text, commit messages, grep patterns) blanked out
+    actual_cmd = parsed.analysis_text()
+    
     # ===================================================================
     # PRE-CHECK: Detect command chaining and dangerous operators
     # ===================================================================
     # Check for command chaining (;, &&, ||, |) that could combine safe + dangerous
-    has_chaining = any(op in actual_cmd for op in [';', '&&', '||'])
-    has_pipe = '|' in actual_cmd and not any(safe in actual_cmd for safe in ['||'])
+    has_chaining = parsed.has_chaining
+    has_pipe = parsed.has_pipe
     
     # If command has chaining or pipes, we CANNOT use safe whitelist
     # Example: "ls && rm -rf /" - "ls" is safe but the chain is dangerous
@@ -398,19 +982,21 @@ def check_command_safety(cmd):
     # ===================================================================
     # STAGE 1: Pattern-based detection (Fast, no AI needed)
     # ===================================================================
-    pattern_matched = False
-    matched_pattern = None
-    pattern_info = None
-    
-    for pattern, info in DESTRUCTIVE_PATTERNS.items():
-        # Use word boundaries for better matching
-        if pattern in actual_cmd:
-            pattern_matched = True
-            matched_pattern = pattern
-            pattern_info = info
-            break
+    # One pass over the command finds every pattern; the most severe one
+    # drives the prompt so a low-severity hit can't hide a critical one
+    pattern_matches = find_destructive_patterns(actual_cmd)
+    pattern_matched = bool(pattern_matches)
     
     if pattern_matched:
+        top_match = pattern_matches[0]
+        matched_pattern = top_match.pattern
+        pattern_info = DESTRUCTIVE_PATTERNS[matched_pattern]
+        log_message(
+            "Pattern matches: " + ", ".join(
+                f"'{m.pattern}'@{m.start}-{m.end} ({m.severity}/{m.category})" for m in pattern_matches
+            ),
+            "INFO"
+        )
         # Display warning based on severity
         severity_emoji = {
             "critical": "🔴",
@@ -423,32 +1009,39 @@ def check_command_safety(cmd):
         print(f"\n{emoji} DANGER: {pattern_info['severity'].upper()} risk command detected!")
         print(f"Pattern: '{matched_pattern}'")
         print(f"Risk: {pattern_info['description']}")
+        other_patterns = []
+        for m in pattern_matches[1:]:
+            if m.pattern != matched_pattern and m.pattern not in other_patterns:
+                other_patterns.append(m.pattern)
+        if other_patterns:
+            print(f"Also matched: {', '.join(repr(p) for p in other_patterns)}")
         
         # Count affected files for rm commands
-        if "rm" in actual_cmd:
-            target_match = re.search(r'rm\s+(?:-[rf]*\s+)?(.+)', actual_cmd)
-            if target_match:
-                target = target_match.group(1).strip()
-                try:
-                    if os.path.exists(target):
-                        if os.path.isfile(target):
-                            print(f"📄 This will delete 1 file: {target}")
-                        elif os.path.isdir(target):
-                            result = subprocess.run(f"find '{target}' -type f 2>/dev/null | wc -l", 
-                                                  shell=True, capture_output=True, text=True)
-                            file_count = result.stdout.strip()
-                            dir_result = subprocess.run(f"find '{target}' -type d 2>/dev/null | wc -l", 
-                                                      shell=True, capture_output=True, text=True)
-                            dir_count = int(dir_result.stdout.strip()) - 1
-                            print(f"📁 This will delete {file_count} files in {dir_count} directories")
+        rm_targets = [t for seg in parsed.segments_for("rm") for t in positional_args(seg.args)]
+        if rm_targets:
+            try:
+                radius = blast_radius.measure(rm_targets)
+                log_message(
+                    f"Blast radius: files={radius.files} dirs={radius.dirs} bytes={radius.bytes} "
+                    f"complete={radius.complete} errors={radius.errors} elapsed={radius.elapsed * 1000:.0f}ms",
+                    "INFO"
+                )
+                if radius.targets:
+                    if radius.dirs == 0 and radius.files == 1:
+                        print(f"📄 This will delete 1 file: {radius.targets[0]} ({blast_radius.format_bytes(radius.bytes)})")
                     else:
-                        print(f"❓ Target '{target}' does not exist")
-                except Exception as e:
-                    print(f"⚠️  Could not analyze target: {e}")
+                        print(f"📁 This will delete {blast_radius.describe(radius)}")
+                    if not radius.complete:
+                        print(f"⏱️  Stopped counting after {radius.elapsed:.1f}s; the real total is larger")
+                    if radius.errors:
+                        print(f"⚠️  {radius.errors} entries could not be read")
+                for target in radius.missing:
+                    print(f"❓ Target '{target}' does not exist")
+            except Exception as e:
+                print(f"⚠️  Could not analyze target: {e}")
         
         print()
-        confirm = input("⚙️  Do you want to proceed? (y/n): ")
-        if confirm.lower() != "y":
+        if not confirm_action(timer):
             print("❌ Command cancelled.")
             return False
         print("✅ Proceeding...\n")
@@ -458,44 +1051,43 @@ def check_command_safety(cmd):
     # Check for file overwrite operations (>)
     # ===================================================================
     overwrite_handled = False
-    if ">" in actual_cmd and not ">>" in actual_cmd:
-        target_match = re.search(r'>\s*([^\s|;&]+)', actual_cmd)
-        if target_match:
-            target_file = target_match.group(1).strip()
-            
-            # Check if redirecting to dangerous target (device, /dev/null, etc.)
-            dangerous_targets = ['/dev/sd', '/dev/hd', '/dev/nvme', '/dev/null']
+    overwrite_targets = [r.target for r in parsed.redirects if r.op in OVERWRITE_REDIRECTS and r.target]
+    if overwrite_targets:
+        # Check if redirecting to dangerous target (device, /dev/null, etc.)
+        dangerous_targets = ['/dev/sd', '/dev/hd', '/dev/nvme', '/dev/null']
+        needs_confirm = False
+        
+        for target_file in overwrite_targets:
             is_dangerous_target = any(target_file.startswith(dt) for dt in dangerous_targets)
             
             # Only warn if file exists OR target is dangerous
-            if os.path.exists(target_file) or is_dangerous_target:
-                if os.path.exists(target_file):
-                    file_size = os.path.getsize(target_file)
-                    print(f"\n⚠️  WARNING: File overwrite detected!")
-                    print(f"📄 Will overwrite: '{target_file}' ({file_size} bytes)")
-                elif is_dangerous_target:
-                    print(f"\n🔴 DANGER: Writing to device/special file!")
-                    print(f"Target: '{target_file}'")
-                
-                confirm = input("⚙️  Do you want to proceed? (y/n): ")
-                if confirm.lower() != "y":
-                    print("❌ Command cancelled.")
-                    return False
-                print("✅ Proceeding...\n")
-                overwrite_handled = True
-            else:
-                # Simple redirect to new file - no warning needed
-                overwrite_handled = True
+            if os.path.exists(target_file):
+                file_size = os.path.getsize(target_file)
+                print(f"\n⚠️  WARNING: File overwrite detected!")
+                print(f"📄 Will overwrite: '{target_file}' ({file_size} bytes)")
+                needs_confirm = True
+            elif is_dangerous_target:
+                print(f"\n🔴 DANGER: Writing to device/special file!")
+                print(f"Target: '{target_file}'")
+                needs_confirm = True
+        
+        if needs_confirm:
+            if not confirm_action(timer):
+                print("❌ Command cancelled.")
+                return False
+            print("✅ Proceeding...\n")
+        # Redirects to new files need no warning
+        overwrite_handled = True
     
     # ===================================================================
     # Simple file deletion check (rm without dangerous flags)
     # ===================================================================
     deletion_handled = False
-    if actual_cmd.strip().startswith('rm '):
-        # Extract target file(s)
-        target_match = re.search(r'rm\s+(?:-[^\s]*\s+)?(.+)', actual_cmd)
-        if target_match:
-            targets = target_match.group(1).strip().split()
+    rm_segments = parsed.segments_for("rm")
+    if rm_segments:
+        # Extract target file(s) from every rm in the command
+        targets = [t for seg in rm_segments for t in positional_args(seg.args)]
+        if targets:
             file_count = 0
             existing_files = []
             
@@ -512,8 +1104,7 @@ def check_command_safety(cmd):
                 else:
                     print(f"⚠️  Will delete {file_count} files: {', '.join(existing_files[:3])}{' ...' if file_count > 3 else ''}")
                 
-                confirm = input("⚙️  Do you want to proceed? (y/n): ")
-                if confirm.lower() != "y":
+                if not confirm_action(timer):
                     print("❌ Command cancelled.")
                     return False
                 print("✅ Proceeding...\n")
@@ -523,11 +1114,7 @@ def check_command_safety(cmd):
     # STAGE 2: AI-based analysis (Only if needed)
     # ===================================================================
     # Check if command needs AI analysis
-    needs_ai_check = False
-    for trigger in AI_CHECK_TRIGGERS.keys():
-        if trigger in actual_cmd.lower():
-            needs_ai_check = True
-            break
+    needs_ai_check = bool(find_ai_triggers(actual_cmd))
     
     # Skip AI check if:
     # 1. Pattern was already matched (already handled)
@@ -541,29 +1128,15 @@ def check_command_safety(cmd):
     
     # Additional check: if chaining exists, check if non-redirect parts are safe
     if has_chaining and overwrite_handled and not pattern_matched:
-        # Split command and check each part
+        # Check each parsed segment
         # If all parts are either handled redirects or safe commands, skip AI
-        parts = []
-        for sep in ['&&', '||', ';', '|']:
-            if sep in actual_cmd:
-                parts = [p.strip() for p in actual_cmd.split(sep)]
-                break
-        
-        # Check if remaining parts are just echo/safe commands
         all_safe = True
-        for part in parts:
-            # Skip empty parts
-            if not part:
-                continue
+        for segment in parsed.segments:
             # Check if this part has dangerous patterns (not just >)
-            has_danger = False
-            for pattern in DESTRUCTIVE_PATTERNS.keys():
-                if pattern in part and pattern != '>':
-                    has_danger = True
-                    break
+            part = parse_command(segment.raw).analysis_text()
+            has_danger = any(m.pattern != '>' for m in find_destructive_patterns(part))
             # If part has rm, mv, cp (dangerous file ops), needs checking
-            if any(cmd in part.split()[0] if part.split() else '' 
-                   for cmd in ['rm', 'mv', 'dd', 'shred', 'truncate']):
+            if segment.command in ['rm', 'mv', 'dd', 'shred', 'truncate']:
                 has_danger = True
             
             if has_danger:
@@ -574,32 +1147,132 @@ def check_command_safety(cmd):
             skip_ai = True
     
     if needs_ai_check and not skip_ai:
-        log_message(f"Sending command for AI safety analysis: {actual_cmd}", "INFO")
-        print("🤖 Running AI safety analysis...")
-        
-        safety_response = call_ai_api(
-            f"Analyze this command for destructiveness. Respond ONLY with: SAFE or DANGEROUS: <one sentence reason>\nCommand: {actual_cmd}"
-        )
+        prefetched_verdict = prefetcher.safety_verdict(parsed.raw) if prefetcher is not None else None
+        if prefetched_verdict is not None:
+            safety_response, from_cache = prefetched_verdict
+        else:
+            safety_response, from_cache = ai_safety_verdict(parsed.raw)
         
         if safety_response and "DANGEROUS" in safety_response.upper():
-            print(f"\n🤖 AI Safety Analysis: {safety_response}")
-            confirm = input("⚙️  Do you want to proceed anyway? (y/n): ")
-            if confirm.lower() != "y":
+            source = " (cached)" if from_cache else ""
+            print(f"\n🤖 AI Safety Analysis{source}: {safety_response}")
+            if not confirm_action(timer, "⚙️  Do you want to proceed anyway? (y/n): "):
                 print("❌ Command cancelled.")
                 return False
             print("✅ Proceeding...\n")
         elif safety_response and "SAFE" in safety_response.upper():
-            log_message(f"AI marked command as safe: {actual_cmd}", "INFO")
+            log_message(f"AI marked command as safe: {parsed.raw}", "INFO")
         else:
-            log_message(f"AI analysis inconclusive: {actual_cmd}", "WARNING")
+            log_message(f"AI analysis inconclusive: {parsed.raw}", "WARNING")
     
     return True
 
+def print_verdict_cache_stats():
+    """Print safety verdict cache counters and the most reused command shapes."""
+    stats = verdict_cache.stats()
+    print(f"\n=== Safety Verdict Cache (TTL {VERDICT_TTL // 3600}h) ===")
+    print(f"📦 Entries: {stats['entries']}")
+    print(f"🎯 Hits: {stats['hits']}  Misses: {stats['misses']}  Hit rate: {stats['hit_rate']:.0%}")
+    for shape, verdict, hits in stats["top"]:
+        print(f"   {hits:>4}x  {verdict:<9} {shape}")
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "-"
+    return f"{seconds * 1000:.0f}ms" if seconds < 10 else f"{seconds:.0f}s"
+
+def format_bytes(n):
+    return f"{n / 1024:.1f}KiB" if n >= 1024 else f"{n}B"
+
+def print_metrics():
+    """Print per-call-type API metrics, function timings and cache hit rates."""
+    snap = metrics.snapshot()
+    print("\n=== API Metrics (since start) ===")
+    if not snap["api"]:
+        print("📡 No API requests yet")
+    for call_type, calls in snap["api"].items():
+        latency = calls["latency_seconds"]
+        print(f"📡 {call_type:<15} {calls['requests']:>5} req  "
+              f"p50 {format_seconds(latency['p50'])}  p95 {format_seconds(latency['p95'])}  "
+              f"p99 {format_seconds(latency['p99'])}  "
+              f"errors {calls['errors']}  timeouts {calls['timeouts']}  cancelled {calls['cancelled']}  "
+              f"{format_bytes(calls['bytes_sent'])} out / {format_bytes(calls['bytes_received'])} in")
+    for name, timer in snap["functions"].items():
+        print(f"⏱️  {name:<22} {timer['count']:>5} calls  p50 {format_seconds(timer['p50'])}  "
+              f"p95 {format_seconds(timer['p95'])}  total {timer['sum']:.1f}s")
+    rates = "  ".join(f"{name} {counters['hit_rate']:.0%}" for name, counters in snap["caches"].items())
+    print(f"🎯 Cache hit rates: {rates}")
+    if METRICS_FILE:
+        print(f"📤 Exported every {METRICS_INTERVAL:g}s to {METRICS_FILE} ({METRICS_FORMAT})")
+
+def handle_safety_cache_command(user_input):
+    """safety-cache [stats | clear | forget <command>]"""
+    if verdict_cache is None:
+        print("Safety verdict cache is disabled (CLIFFY_VERDICT_CACHE=0)")
+        return
+    parts = user_input.split(None, 2)
+    action = parts[1] if len(parts) > 1 else "stats"
+    if action == "stats":
+        print_verdict_cache_stats()
+    elif action == "clear":
+        removed = verdict_cache.invalidate()
+        log_message(f"Safety verdict cache cleared ({removed} entries)", "INFO")
+        print(f"🗑️  Cleared {removed} cached safety verdict(s)")
+    elif action == "forget" and len(parts) > 2:
+        removed = verdict_cache.invalidate(parts[2])
+        log_message(f"Safety verdict forgotten for: {parts[2]}", "INFO")
+        print(f"🗑️  Forgot {removed} cached safety verdict(s) for that command shape")
+    else:
+        print("Usage: safety-cache [stats | clear | forget <command>]")
+
+def start_coding_preparation(task):
+    """Issue the independent %%% preparation calls concurrently.
+    
+    Returns futures keyed by "intent", "filename" and "plan". Per-call and
+    wall-clock timings are logged once all three have finished.
+    """
+    calls = {
+        "intent": lambda: ai_parse_task_intent(task),
+        "filename": lambda: call_ai_api(f"Suggest a filename for: {task}", call_type="codegen"),
+        "plan": lambda: get_file_plan(task),
+    }
+    started = time.perf_counter()
+    timings = {}
+    timings_lock = threading.Lock()
+    
+    def timed(name, fn):
+        call_start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            finished = time.perf_counter()
+            with timings_lock:
+                timings[name] = finished - call_start
+                if len(timings) == len(calls):
+                    sequential = sum(timings.values())
+                    wall = finished - started
+                    log_message(
+                        "Coding prep: " + " ".join(f"{k}={v:.2f}s" for k, v in timings.items())
+                        + f" wall={wall:.2f}s sequential={sequential:.2f}s saved={sequential - wall:.2f}s",
+                        "INFO"
+                    )
+    
+    return {name: prep_executor.submit(timed, name, fn) for name, fn in calls.items()}
+
+def preparation_result(futures, name, default):
+    """Result of one preparation call, or default if it failed."""
+    try:
+        return futures[name].result()
+    except Exception as e:
+        log_message(f"Coding prep {name} failed: {e}", "ERROR")
+        return default
+
 def interactive_coding(task):
     """Interactive code generation session"""
     print(f"Starting interactive coding for: {task}")
     
-    intent = ai_parse_task_intent(task)
+    preparation = start_coding_preparation(task)
+    intent = preparation_result(preparation, "intent", {"needs_dir": False, "dir_name": ""})
     directory = intent.get("dir_name") if intent.get("needs_dir") else ""
     if not directory:
         fallback_dir = extract_directory_name(task)
@@ -624,7 +1297,7 @@ def interactive_coding(task):
     if directory:
         os.makedirs(directory, exist_ok=True)
 
-    file_suggestion = clean_single_line(call_ai_api(f"Suggest a filename for: {task}"), "generated_script.py")
+    file_suggestion = clean_single_line(preparation_result(preparation, "filename", ""), "generated_script.py")
     if not is_probable_filename(file_suggestion):
         file_suggestion = "server.py" if "server" in task.lower() else "main.py"
     filename = prompt_inline_default(file_suggestion, "")
@@ -651,14 +1324,15 @@ def interactive_coding(task):
                 return "\n".join(lines).strip()
         return text
 
-    file_plan = get_file_plan(task)
+    file_plan = preparation_result(preparation, "plan", [])
     file_plan = [f for f in file_plan if is_probable_filename(f)]
     # If the model doesn't suggest multiple files, treat as single-file
     if not file_plan or len(file_plan) == 1:
         response = call_ai_api(
             "Write the complete code for this task as a single file. "
             "Return ONLY code, no markdown, no explanation.\n\n"
-            f"Task: {task}\nFilename: {filename}"
+            f"Task: {task}\nFilename: {filename}",
+            call_type="codegen"
         )
         code = extract_code_block(response)
         if not code:
@@ -669,9 +1343,37 @@ def interactive_coding(task):
         print(f"Auto-saved to {filename}")
         return
 
-    # Multi-file: generate each file in one shot, per user approval
+    # Multi-file: approve the whole plan and generate everything concurrently,
+    # or fall back to confirming files one at a time
+    planned = [clean_single_line(f, "generated_file.txt") for f in file_plan]
+    if len(planned) > MAX_PLAN_FILES:
+        print(f"\nThe plan has {len(planned)} files; showing the first {MAX_PLAN_FILES}.")
+        more = prompt_user_text(f"More files detected. Include all {len(planned)}? [y/N] ")
+        if more is None:
+            print("\nReturning to main prompt...")
+            return
+        if more.strip().lower() not in ("y", "yes"):
+            planned = planned[:MAX_PLAN_FILES]
+    print(f"\nFile plan ({len(planned)} files):")
+    for idx, suggested in enumerate(planned, start=1):
+        print(f"  {idx}. {os.path.join(directory, suggested) if directory else suggested}")
+    approve = prompt_user_text(f"Generate all {len(planned)} files now? [y/N] ")
+    if approve is None:
+        print("\nReturning to main prompt...")
+        return
+    if approve.strip().lower() in ("y", "yes"):
+        targets = review_plan_targets(planned, directory)
+        if targets is None:
+            print("\nReturning to main prompt...")
+            return
+        if targets:
+            generate_files_concurrently(task, targets, extract_code_block)
+        else:
+            print("No files to generate.")
+        return
+
     for idx, suggested in enumerate(file_plan, start=1):
-        if idx > 6:
+        if idx > MAX_PLAN_FILES:
             more = prompt_user_text("More files detected. Continue? [y/N] ")
             if not more or more.lower() != "y":
                 print("Stopping additional files.")
@@ -697,7 +1399,8 @@ def interactive_coding(task):
             continue
         response = call_ai_api(
             "Write the complete code for this file. Return ONLY code, no markdown, no explanation.\n\n"
-            f"Task: {task}\nFilename: {target_file}"
+            f"Task: {task}\nFilename: {target_file}",
+            call_type="codegen"
         )
         code = extract_code_block(response)
         if not code:
@@ -707,6 +1410,150 @@ def interactive_coding(task):
             f.write(code)
         print(f"Auto-saved to {target_file}")
 
+def review_plan_targets(planned, directory):
+    """Target paths for an approved plan, asking about each risky one.
+
+    Paths that are absolute, contain "..", or resolve outside the project
+    directory, and files that already exist, are only kept if the user
+    confirms them one by one. Returns None if the user backs out.
+    """
+    base = os.path.realpath(directory or ".")
+    targets = []
+    for suggested in planned:
+        target = os.path.join(directory, suggested) if directory else suggested
+        resolved = os.path.realpath(target)
+        reasons = []
+        if os.path.isabs(suggested) or ".." in re.split(r"[\\/]", suggested) \
+                or os.path.commonpath([base, resolved]) != base:
+            reasons.append("is outside the project directory")
+        if os.path.exists(target):
+            reasons.append("already exists and would be overwritten")
+        if reasons:
+            confirm = prompt_user_text(f"⚠️  {target} {' and '.join(reasons)}. Write it anyway? [y/N] ")
+            if confirm is None:
+                return None
+            if confirm.strip().lower() not in ("y", "yes"):
+                print(f"Skipped {target}.")
+                continue
+        targets.append(target)
+    return targets
+
+def generate_files_concurrently(task, targets, extract_code):
+    """Generate every target file through a bounded worker pool.
+    
+    Files are written as soon as their response arrives; progress is printed
+    per file and each file's latency is logged.
+    """
+    total = len(targets)
+    workers = min(CODEGEN_WORKERS, total)
+    print(f"Generating {total} files ({workers} at a time)...")
+    
+    def generate(target_file):
+        start = time.perf_counter()
+        response = call_ai_api(
+            "Write the complete code for this file. Return ONLY code, no markdown, no explanation.\n\n"
+            f"Task: {task}\nFiles in this project: {', '.join(targets)}\nFilename: {target_file}",
+            call_type="codegen"
+        )
+        return extract_code(response), time.perf_counter() - start
+    
+    started = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cliffy-codegen")
+    futures = {executor.submit(generate, target): target for target in targets}
+    done = written = 0
+    try:
+        for future in as_completed(futures):
+            target_file = futures[future]
+            done += 1
+            try:
+                code, elapsed = future.result()
+            except Exception as e:
+                log_message(f"Codegen {target_file}: failed: {e}", "ERROR")
+                print(f"[{done}/{total}] ⚠️  {target_file}: {e}")
+                continue
+            log_message(f"Codegen {target_file}: {elapsed:.2f}s, {len(code)} chars", "INFO")
+            if not code:
+                print(f"[{done}/{total}] ⚠️  {target_file}: no code returned ({elapsed:.1f}s)")
+                continue
+            parent = os.path.dirname(target_file)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            with open(target_file, "w") as f:
+                f.write(code)
+            written += 1
+            print(f"[{done}/{total}] ✅ Auto-saved to {target_file} ({elapsed:.1f}s)")
+    except KeyboardInterrupt:
+        print(f"\nCancelled; {written} of {total} files written.")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    wall = time.perf_counter() - started
+    log_message(f"Codegen batch: {written}/{total} files in {wall:.2f}s with {workers} workers", "INFO")
+    print(f"Done: {written}/{total} files in {wall:.1f}s")
+
+def explain_command(command):
+    """One-sentence explanation of a single command ("" on failure)."""
+    try:
+        explanation = call_ai_api(
+            "Explain what this command does in one short sentence. "
+            "No markdown, no bullets.\n"
+            f"Command: {command}",
+            call_type="explain"
+        )
+    except Exception:
+        explanation = ""
+    return (explanation or "").strip()
+
+def parse_step_explanations(response, count):
+    """Parse a batched explanation response into a list of count strings.
+    
+    Accepts a JSON array of strings (the requested format) or, as a
+    fallback, numbered lines like "1. ...". Missing entries are "".
+    """
+    text = (response or "").strip()
+    if "```" in text:
+        parts = text.split("```")
+        if len(parts) >= 2:
+            text = parts[1].strip()
+            if text.lower().startswith("json"):
+                text = text[4:].strip()
+    explanations = [""] * count
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get("explanations") or data.get("steps") or []
+        for index, item in enumerate(data[:count]):
+            if isinstance(item, dict):
+                item = item.get("explanation", "")
+            explanations[index] = str(item).strip()
+        return explanations
+    except Exception:
+        pass
+    for line in text.splitlines():
+        match = re.match(r"\s*(\d+)[.):]\s*(.+)", line)
+        if match and 1 <= int(match.group(1)) <= count:
+            explanations[int(match.group(1)) - 1] = match.group(2).strip()
+    return explanations
+
+def explain_steps(steps):
+    """Explain every step of a plan in one request; returns {step: explanation}."""
+    if len(steps) == 1:
+        return {steps[0]: explain_command(steps[0])}
+    numbered = "\n".join(f"{i}. {step}" for i, step in enumerate(steps, start=1))
+    try:
+        response = call_ai_api(
+            "Explain what each of these commands does in one short sentence each. "
+            "Return ONLY a JSON array of strings, one per command, in the same order. "
+            "No markdown.\n"
+            f"Commands:\n{numbered}",
+            call_type="explain"
+        )
+    except Exception:
+        response = ""
+    explanations = parse_step_explanations(response, len(steps))
+    log_message(f"Batched explanations: {sum(1 for e in explanations if e)}/{len(steps)} steps", "INFO")
+    # Steps the batch missed stay out of the table and are explained on demand
+    return {step: text for step, text in zip(steps, explanations) if text}
+
 def execute_task(task):
     """Execute a task directly using AI-generated commands"""
     print(f"Executing task: {task}")
@@ -722,7 +1569,7 @@ Examples:
 Use 'mkdir' for directories/folders, 'touch' for files.
 Avoid sudo. Prefer user-level commands (ps, ss, lsof) and no password prompts.
 Do NOT include destructive actions like kill/killall/pkill/rm unless explicitly asked.
-Respond with only the command.""")
+Respond with only the command.""", call_type="task")
     
     if command:
         # Clean markdown formatting
@@ -740,39 +1587,41 @@ Respond with only the command.""")
         if not steps:
             print("Sorry, couldn't generate a command for this task.")
             return
-        for step in steps:
-            command_to_run = prompt_command_edit(step)
-            if command_to_run is None:
-                print("\nReturning to main prompt...")
-                return
-            if command_to_run == "":
-                print("Step skipped.")
-                continue
-            try:
-                explanation = call_ai_api(
-                    "Explain what this command does in one short sentence. "
-                    "No markdown, no bullets.\n"
-                    f"Command: {command_to_run}"
-                )
-            except Exception:
-                explanation = ""
-            if explanation:
-                print(f"Info: {explanation.strip()}")
-            if "sudo" in command_to_run:
-                warn = prompt_user_text("This step uses sudo. Proceed? [y/N] ")
-                if not warn or warn.lower() != "y":
+        # Explanations (one batched request) and AI safety verdicts for every
+        # step are fetched in the background while the user reviews step 1
+        prefetcher = StepPrefetcher(steps)
+        try:
+            for step in steps:
+                command_to_run = prompt_command_edit(step)
+                if command_to_run is None:
+                    print("\nReturning to main prompt...")
+                    return
+                if command_to_run == "":
                     print("Step skipped.")
                     continue
-            confirm = prompt_user_text("Execute this step? [y/N] ")
-            if confirm is None:
-                print("\nReturning to main prompt...")
-                return
-            if confirm.lower() == "y":
-                if check_command_safety(command_to_run):
-                    print(f"{COLOR_CMD}$ {command_to_run}{COLOR_RESET}")
-                    execute_command(command_to_run)
-            else:
-                print("Step skipped.")
+                if command_to_run != step:
+                    prefetcher.invalidate(step)
+                    prefetcher.prefetch(command_to_run)
+                explanation = prefetcher.explanation(command_to_run)
+                if explanation:
+                    print(f"Info: {explanation.strip()}")
+                if parse_command(command_to_run).uses_sudo:
+                    warn = prompt_user_text("This step uses sudo. Proceed? [y/N] ")
+                    if not warn or warn.lower() != "y":
+                        print("Step skipped.")
+                        continue
+                confirm = prompt_user_text("Execute this step? [y/N] ")
+                if confirm is None:
+                    print("\nReturning to main prompt...")
+                    return
+                if confirm.lower() == "y":
+                    if check_command_safety(command_to_run, prefetcher):
+                        print(f"{COLOR_CMD}$ {command_to_run}{COLOR_RESET}")
+                        execute_command(command_to_run)
+                else:
+                    print("Step skipped.")
+        finally:
+            prefetcher.close()
     else:
         print("Sorry, couldn't generate a command for this task.")
 
@@ -799,14 +1648,16 @@ def auto_code_task(task):
     """Automatically generate code for a task and save to a file."""
     print(f"Generating code for: {task}")
     file_suggestion = call_ai_api(
-        f"Suggest a short, valid filename for this task. Return only the filename.\nTask: {task}"
+        f"Suggest a short, valid filename for this task. Return only the filename.\nTask: {task}",
+        call_type="codegen"
     )
     filename = normalize_filename(file_suggestion or "generated_script.py")
     filename = ensure_unique_filename(filename)
 
     code = call_ai_api(
         f"Write complete, runnable code in a single file for this task. "
-        f"Return only code, no explanations.\nTask: {task}\nFilename: {filename}"
+        f"Return only code, no explanations.\nTask: {task}\nFilename: {filename}",
+        call_type="codegen"
     )
 
     if not code:
@@ -836,28 +1687,66 @@ class SuggestionThread(threading.Thread):
         
     def run(self):
         try:
-            suggestion = call_ai_api(f"Suggest a one-line terminal command to: {self.task}")
+            suggestion = call_ai_api(f"Suggest a one-line terminal command to: {self.task}", call_type="command")
             self.result_queue.put(('success', suggestion))
         except Exception as e:
             self.result_queue.put(('error', str(e)))
 
+@metrics.timed("execute_command")
 def execute_command(cmd):
-    """Execute command with proper handling of shell builtins and expansions"""
+    """Execute command in the persistent shell (or a one-off bash if it is disabled)"""
     cmd = cmd.strip()
-    
-    # List of commands that must run in parent process
-    parent_process_commands = ['cd', 'pushd', 'popd', 'export', 'set', 'unset', 'alias', 'unalias', 'source', '.']
-    
-    # Check if command starts with any parent process command
-    cmd_parts = cmd.split()
-    if not cmd_parts:
+    if not cmd:
         return
     
-    base_cmd = cmd_parts[0]
+    command_history.record(cmd)
+    command_predictor.learn(cmd)
+    try:
+        run_command(cmd)
+    finally:
+        # `export PATH=...` in the shell lands in os.environ; re-read the command index
+        command_index.sync_path()
+        # The fuzzy index follows the cwd; the new tree is only walked on the next fuzzy query
+        if path_index is not None:
+            try:
+                path_index.set_root(os.getcwd())
+            except OSError:
+                pass
+
+def run_command(cmd):
+    """Run cmd in the persistent shell, falling back to bash -c"""
+    if persistent_shell is not None:
+        try:
+            status = persistent_shell.run(cmd)
+            if status != 0:
+                print(f"Command exited with code {status}")
+            return
+        except ShellExited:
+            log_message("Persistent shell exited; restarting on next command", "WARNING")
+            print("Shell exited; a fresh one will start with the next command")
+            return
+        except OSError as e:
+            # bash could not be started; fall back to one process per command
+            log_message(f"Persistent shell unavailable: {e}", "ERROR")
+    
+    execute_command_subprocess(cmd)
+
+def execute_command_subprocess(cmd):
+    """Run cmd with bash -c, emulating builtins that must change this process"""
+    # Builtins only run in the parent process for a plain single command;
+    # anything with pipes, chaining, redirects or prefixes goes to bash
+    parsed = parse_command(cmd)
+    segment = parsed.segments[0] if parsed.segments else None
+    is_builtin_call = (
+        parsed.is_simple and not parsed.unterminated
+        and not segment.prefixes and not segment.assignments and not segment.redirects
+    )
+    base_cmd = segment.command if is_builtin_call else ''
+    args = segment.args if is_builtin_call else ()
     
     # Handle cd command
     if base_cmd == 'cd':
-        path = cmd[2:].strip() if len(cmd) > 2 else ''
+        path = args[0] if args else ''
         if not path:  # cd with no arguments goes to home
             path = os.path.expanduser("~")
         else:
@@ -881,13 +1770,12 @@ def execute_command(cmd):
     
     # Handle export (set environment variables in parent process)
     if base_cmd == 'export':
-        export_match = re.match(r'export\s+([A-Za-z_][A-Za-z0-9_]*)=(.+)', cmd)
-        if export_match:
-            var_name, var_value = export_match.groups()
-            # Remove quotes if present
-            var_value = var_value.strip().strip('"').strip("'")
-            os.environ[var_name] = var_value
-            print(f"Exported {var_name}={var_value}")
+        assignments = [arg.split('=', 1) for arg in args if re.match(r'[A-Za-z_][A-Za-z0-9_]*=', arg)]
+        if assignments:
+            # Quotes were already removed by the parser
+            for var_name, var_value in assignments:
+                os.environ[var_name] = var_value
+                print(f"Exported {var_name}={var_value}")
         else:
             # Just display environment variables
             subprocess.run(['bash', '-c', cmd], check=False)
@@ -895,8 +1783,7 @@ def execute_command(cmd):
     
     # Handle unset
     if base_cmd == 'unset':
-        if len(cmd_parts) > 1:
-            var_name = cmd_parts[1]
+        for var_name in args:
             if var_name in os.environ:
                 del os.environ[var_name]
                 print(f"Unset {var_name}")
@@ -968,14 +1855,16 @@ def clean_single_line(text, fallback=""):
         parts = text.split("```")
         if len(parts) >= 2:
             text = parts[1].strip()
-    text = text.splitlines()[0].strip()
+    lines = text.splitlines()
+    text = lines[0].strip() if lines else ""
     return text or fallback
 
 def get_file_plan(task):
     """Ask the model for a list of files to generate; return list of filenames."""
     response = call_ai_api(
         "List the files needed for this task. Return one file per line, no bullets, no extra text.\n"
-        f"Task: {task}"
+        f"Task: {task}",
+        call_type="codegen"
     )
     if not response:
         return []
@@ -1012,7 +1901,8 @@ def ai_parse_task_intent(task):
     response = call_ai_api(
         "Parse the task into JSON with keys: needs_dir (true/false), dir_name (string or empty). "
         "Return ONLY JSON.\n"
-        f"Task: {task}"
+        f"Task: {task}",
+        call_type="codegen"
     )
     if not response:
         return {"needs_dir": False, "dir_name": ""}
@@ -1032,60 +1922,48 @@ def ai_parse_task_intent(task):
 
 def split_command_steps(command):
     """Split a command string into steps on && or ; while respecting quotes."""
-    steps = []
-    buf = []
-    in_single = False
-    in_double = False
-    escape = False
-    i = 0
-    while i < len(command):
-        ch = command[i]
-        if escape:
-            buf.append(ch)
-            escape = False
-            i += 1
-            continue
-        if ch == "\\":
-            buf.append(ch)
-            escape = True
-            i += 1
-            continue
-        if ch == "'" and not in_double:
-            in_single = not in_single
-            buf.append(ch)
-            i += 1
-            continue
-        if ch == '"' and not in_single:
-            in_double = not in_double
-            buf.append(ch)
-            i += 1
-            continue
-        if not in_single and not in_double:
-            if command.startswith("&&", i):
-                step = "".join(buf).strip()
-                if step:
-                    steps.append(step)
-                buf = []
-                i += 2
-                continue
-            if ch == ";":
-                step = "".join(buf).strip()
-                if step:
-                    steps.append(step)
-                buf = []
-                i += 1
-                continue
-        buf.append(ch)
-        i += 1
-    last = "".join(buf).strip()
-    if last:
-        steps.append(last)
-    return steps
+    return parse_command(command).steps()
+
+def print_startup_profile():
+    """Print the time between consecutive startup checkpoints."""
+    print("=== Startup profile ===")
+    previous = startup_marks[0][1]
+    for label, stamp in startup_marks[1:]:
+        print(f"  {label:<22} {(stamp - previous) * 1000:7.1f} ms")
+        previous = stamp
+    total = (startup_marks[-1][1] - startup_marks[0][1]) * 1000
+    print(f"  {'total (after python)':<22} {total:7.1f} ms")
+    print("  (python -X importtime ai_shell_integration.py shows per-module detail)")
+    print()
+
+def start_connection_probe(session=None):
+    """Test the API connection in the background; the prompt shows the result."""
+    api_connection_status["checking"] = True
+    
+    def probe():
+        test_api_connection(quiet=True)
+        if session is not None and session.app.is_running:
+            session.app.invalidate()
+    
+    threading.Thread(target=probe, name="cliffy-connection-probe", daemon=True).start()
+
+def start_metrics_export():
+    """Rewrite METRICS_FILE every METRICS_INTERVAL seconds (and at exit)."""
+    if METRICS_FORMAT not in METRICS_FORMATS:
+        log_message(f"Unknown CLIFFY_METRICS_FORMAT {METRICS_FORMAT!r}; metrics are not exported", "WARNING")
+        return
+    metrics.start_export(
+        METRICS_FILE, METRICS_FORMAT, METRICS_INTERVAL,
+        on_error=lambda e: log_message("Metrics export failed", "WARNING", path=METRICS_FILE, error=str(e))
+    )
+    log_message("Exporting metrics", "INFO", path=METRICS_FILE, format=METRICS_FORMAT, interval=METRICS_INTERVAL)
 
 def main():
     style = Style.from_dict({
         'prompt': '#00aa00 bold',
         'auto-suggestion': '#666666',  # Changed from 'suggestion' to 'auto-suggestion'
+        'checking': '#888888',
+        'offline': '#aa0000',
     })
     
     def get_prompt():
@@ -1093,7 +1971,13 @@ def main():
         home = os.path.expanduser("~")
         if cwd.startswith(home):
             cwd = "~" + cwd[len(home):]
-        return HTML(f'<prompt>{cwd} $ </prompt>')
+        if api_connection_status["checking"]:
+            status = '<checking>[connecting] </checking>'
+        elif not api_connection_status["connected"]:
+            status = '<offline>[offline] </offline>'
+        else:
+            status = ''
+        return HTML(f'{status}<prompt>{cwd} $ </prompt>')
 
     session = PromptSession(
         get_prompt,
@@ -1139,26 +2023,24 @@ def main():
 
     session.key_bindings = bindings
 
-    last_fetch_time = 0
+    pending_suggestion_task = None
     
     def on_text_changed(_):
-        nonlocal last_fetch_time
-        current_time = time.time()
+        nonlocal pending_suggestion_task
+        # Latest wins: supersede and cancel whatever the previous keystroke started
+        generation = next_suggestion_generation()
+        if pending_suggestion_task is not None and not pending_suggestion_task.done():
+            pending_suggestion_task.cancel()
+        pending_suggestion_task = None
         
-        if current_time - last_fetch_time < 0.15:  # Faster response while still debounced
-            return
-        
-        last_fetch_time = current_time
         buffer_text = session.default_buffer.document.text
         
         if buffer_text.startswith("?") or len(buffer_text.strip()) < 2:
             return
         
-        threading.Thread(
-            target=fetch_suggestion_async,
-            args=(buffer_text, session),
-            daemon=True
-        ).start()
+        pending_suggestion_task = session.app.create_background_task(
+            suggestion_pipeline(buffer_text, generation, session)
+        )
 
     session.default_buffer.on_text_changed += on_text_changed
 
@@ -1171,21 +2053,44 @@ def main():
     print("- %% : execute a multi-step task")
     print("- %%%: interactive coding mode")
     print("- status: show AI connection status")
+    print("- safety-cache [clear | forget <cmd>]: manage cached AI safety verdicts")
     print()
     
-    # Test API connection on startup
-    test_api_connection()
-    print()
+    # Everything slow happens off the prompt thread once the prompt is up:
+    # warming caches, training the predictor and testing the API (its result
+    # shows up in the prompt). Starting them earlier would compete with the
+    # first render for the GIL.
+    def load_startup_state():
+        command_index.refresh_async()
+        load_persistent_suggestions()
+        load_local_models()
+    api_connection_status["checking"] = True
     print(f"📝 Logs are saved to: {LOG_FILE}")
     print("💡 Type 'status' to check AI connection status")
     print()
+    startup_mark("main setup")
+    
+    def on_first_prompt():
+        # Runs once the prompt application is up; the profile prints above it
+        startup_mark("first prompt")
+        threading.Thread(target=load_startup_state, name="cliffy-startup-load", daemon=True).start()
+        start_connection_probe(session)
+        if METRICS_FILE:
+            start_metrics_export()
+        log_message(
+            f"Startup: first prompt after {(time.perf_counter() - startup_marks[0][1]) * 1000:.0f}ms",
+            "INFO"
+        )
+        if STARTUP_PROFILE:
+            run_in_terminal(print_startup_profile)
+    first_prompt = True
     
     while True:
         try:
-            user_input = session.prompt()
+            user_input = session.prompt(pre_run=on_first_prompt if first_prompt else None)
+            first_prompt = False
             
-            with suggestion_lock:
-                current_suggestion = ""
+            publish_suggestion("", next_suggestion_generation())
 
             if user_input in (None, "INTERRUPT"):
                 print("\nUse 'exit' or 'quit' to exit")
@@ -1204,7 +2109,9 @@ def main():
             elif user_input.lower() == "status":
                 # Show API connection status
                 print("\n=== AI Connection Status ===")
-                if api_connection_status["connected"]:
+                if api_connection_status["checking"]:
+                    print("⏳ Status: Checking...")
+                elif api_connection_status["connected"]:
                     print("✅ Status: Connected")
                     print(f"🕐 Last check: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(api_connection_status['last_check']))}")
                 else:
@@ -1214,7 +2121,7 @@ def main():
                     if api_connection_status["last_check"]:
                         print(f"🕐 Last check: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(api_connection_status['last_check']))}")
                 
-                print(f"📝 Log file: {LOG_FILE}")
+                print(f"📝 Log file: {LOG_FILE} (level {LOG_LEVEL}, {logger.fmt})")
                 print(f"🔧 API endpoint: {API_ENDPOINT}")
                 if API_KEY:
                     print(f"🔑 API key: {API_KEY[:6]}...{API_KEY[-4:]}")
@@ -1222,6 +2129,31 @@ def main():
                     print("🔑 API key: (not set)")
                 print(f"🧠 Model: {MODEL}")
                 
+                with cache_lock:
+                    cache_stats = suggestion_cache.stats()
+                print(f"\n=== Suggestion Cache ({cache_stats['policy']}) ===")
+                print(f"📦 Entries: {cache_stats['entries']}/{cache_stats['max_entries']}  "
+                      f"~{cache_stats['bytes'] / 1024:.1f}/{cache_stats['max_bytes'] / 1024:.0f} KiB")
+                print(f"🎯 Hits: {cache_stats['hits']}  Misses: {cache_stats['misses']}  "
+                      f"Hit rate: {cache_stats['hit_rate']:.0%}")
+                print(f"🗑️  Evictions: {cache_stats['evictions']}  Rejected by admission: {cache_stats['rejections']}")
+                
+                if verdict_cache is not None:
+                    print_verdict_cache_stats()
+                
+                print_metrics()
+                
+                print(f"\n📂 Path completion: {dir_cache.hits} cached / {dir_cache.misses} listed")
+                if command_index.ready:
+                    print(f"⌨️  Commands indexed: {len(command_index.names)} from {len(command_index.path.split(os.pathsep))} PATH entries "
+                          f"(last read {command_index.build_seconds * 1000:.0f} ms)")
+                if path_index is not None:
+                    if path_index.ready:
+                        print(f"🔎 Fuzzy index: {path_index.size} paths under {path_index.root} "
+                              f"({'truncated, ' if path_index.truncated else ''}last update {path_index.build_seconds * 1000:.0f} ms)")
+                    else:
+                        print("🔎 Fuzzy index: builds on the first fuzzy completion")
+                
                 # Offer to retest
                 retest = input("\nTest connection now? [y/N]: ")
                 if retest.lower() == 'y':
@@ -1229,9 +2161,13 @@ def main():
                 print()
                 continue
             
+            elif user_input.split()[:1] == ["safety-cache"]:
+                handle_safety_cache_command(user_input)
+                continue
+            
             elif user_input == "%":
                 # Check if AI is connected
-                if not api_connection_status["connected"]:
+                if not api_connection_status["connected"] and not api_connection_status["checking"]:
                     print("⚠️  Warning: AI is not connected. Type 'status' to check connection.")
                     print("Attempting to proceed anyway...")
                 
@@ -1249,7 +2185,7 @@ def main():
                     log_message(f"User requested command for: {task}", "INFO")
                     
                     # Better prompt for more specific commands
-                    suggestion = call_ai_api(f"Generate a specific shell command to: {task}. For creating directories, use meaningful names like 'my_folder' or 'new_directory'. Respond with only the command.")
+                    suggestion = call_ai_api(f"Generate a specific shell command to: {task}. For creating directories, use meaningful names like 'my_folder' or 'new_directory'. Respond with only the command.", call_type="command")
                     
                     if suggestion:
                         # Normalize accidental code fencing/backticks from the model
@@ -1272,7 +2208,7 @@ def main():
             
             elif user_input == "%%":
                 # Check if AI is connected
-                if not api_connection_status["connected"]:
+                if not api_connection_status["connected"] and not api_connection_status["checking"]:
                     print("⚠️  Warning: AI is not connected. Type 'status' to check connection.")
                     print("Attempting to proceed anyway...")
                 
@@ -1297,7 +2233,7 @@ def main():
             
             elif user_input == "%%%" or user_input.startswith("%%%"):
                 # Check if AI is connected
-                if not api_connection_status["connected"]:
+                if not api_connection_status["connected"] and not api_connection_status["checking"]:
                     print("⚠️  Warning: AI is not connected. Type 'status' to check connection.")
                     print("Attempting to proceed anyway...")
                 
@@ -1327,6 +2263,14 @@ def main():
         except Exception as e:
             print(f"\nError: {e}")
 
+    if suggestion_store is not None:
+        suggestion_store.close()
+    if verdict_cache is not None:
+        verdict_cache.close()
+    if persistent_shell is not None:
+        persistent_shell.close()
+    logger.close()
+    
     # Optional: allow a parent shell wrapper to update its cwd after exit
     cwd_file = os.getenv("CLIFFY_CWD_FILE", "").strip()
     if cwd_file:
@@ -0,0 +1,129 @@
+"""
+Cliffy Async Logger
+Queue-backed log writer: callers only enqueue a tuple, a background thread
+formats records and appends them to the log file in batches, flushing at
+least every flush_interval seconds.
+
+Records below the level threshold are dropped before anything is
+formatted. Extra keyword fields are kept structured: in "text" format
+they are appended as key=value pairs (values quoted when needed), in
+"json" format each record is one JSON object per line.
+"""
+
+import atexit
+import json
+import queue
+import threading
+import time
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        text = f"{value:.3f}".rstrip("0").rstrip(".")
+    else:
+        text = str(value)
+    if not text or any(ch in text for ch in ' "=\n\t'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+class BatchLogger:
+    """Append-only file logger with a background writer thread."""
+
+    def __init__(self, path, level="INFO", fmt="text", flush_interval=0.5, batch_size=256):
+        self.path = path
+        self.threshold = LEVELS.get(level.upper(), LEVELS["INFO"])
+        self.fmt = fmt if fmt in ("text", "json") else "text"
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=10000)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def enabled(self, level):
+        return LEVELS.get(level, LEVELS["INFO"]) >= self.threshold
+
+    def log(self, level, message, fields=None):
+        """Queue one record; never blocks and never raises."""
+        if LEVELS.get(level, LEVELS["INFO"]) < self.threshold:
+            return
+        if self._writer is None:
+            self._start()
+        try:
+            self._queue.put_nowait((time.time(), level, message, fields))
+        except queue.Full:
+            self.dropped += 1  # The disk can't keep up; losing log lines beats stalling the UI
+
+    def flush(self, timeout=2.0):
+        """Block until everything queued so far has been written."""
+        if self._writer is None:
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def close(self, timeout=2.0):
+        """Write pending records and stop the writer thread."""
+        with self._writer_lock:
+            writer = self._writer
+            if writer is None:
+                return
+            self._queue.put(None)
+            writer.join(timeout)
+            self._writer = None
+
+    def _start(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="cliffy-logger", daemon=True)
+                self._writer.start()
+
+    def format(self, record):
+        stamp, level, message, fields = record
+        if self.fmt == "json":
+            entry = {"ts": round(stamp, 3), "level": level, "msg": message}
+            if fields:
+                entry.update(fields)
+            return json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        line = f"[{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stamp))}] [{level}] {message}"
+        if fields:
+            line += " " + " ".join(f"{key}={_format_value(value)}" for key, value in fields.items())
+        return line + "\n"
+
+    def _write_loop(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [item]
+            # Collect whatever arrives within the flush window, up to batch_size
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and item is not None and not isinstance(item, threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+            records = [r for r in batch if isinstance(r, tuple)]
+            if records:
+                try:
+                    with open(self.path, "a", encoding="utf-8", errors="replace") as f:
+                        f.write("".join(self.format(r) for r in records))
+                except Exception:
+                    pass  # Silent fail if logging doesn't work
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in batch:
+                return
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: n-gram command predictor latency and top-1 accuracy
+Replays a history file in order; before learning each command, the model
+predicts it from two typed prefixes (half of the first word, and the
+first word plus a space). Without a history file a synthetic ops-style
+history is generated.
+
+Usage: python3 benchmarks/bench_command_predictor.py [history_file]
+Example: python3 benchmarks/bench_command_predictor.py ~/.ai_shell_history
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_predictor import CommandPredictor
+
+WORKFLOWS = [
+    ["git status", "git add -A", "git commit -m 'wip'", "git push origin main"],
+    ["cd /var/log", "tail -n 100 syslog", "grep -i error syslog"],
+    ["docker ps", "docker logs -f web", "docker restart web"],
+    ["kubectl get pods -n prod", "kubectl describe pod api-0 -n prod", "kubectl logs api-0 -n prod"],
+    ["systemctl status nginx", "sudo systemctl restart nginx", "journalctl -u nginx -n 50"],
+    ["ls -la", "du -sh *", "df -h"],
+]
+
+
+def synthetic_history(count=3000, seed=7):
+    rng = random.Random(seed)
+    commands = []
+    while len(commands) < count:
+        flow = rng.choice(WORKFLOWS)
+        for command in flow[:rng.randint(1, len(flow))]:
+            if rng.random() < 0.1:
+                command = f"{command} # {rng.randrange(1000)}"
+            commands.append(command)
+    return commands[:count]
+
+
+def read_history(path):
+    commands = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t", 2)
+            command = parts[2] if len(parts) == 3 else parts[0]
+            if command.strip():
+                commands.append(command)
+    return commands
+
+
+def prefixes_for(command):
+    first = command.split()[0]
+    yield first[:max(1, len(first) // 2)]
+    if len(command.split()) > 1:
+        yield first + " "
+
+
+def run(commands):
+    predictor = CommandPredictor()
+    latencies = []
+    attempts = hits = confident = confident_hits = 0
+
+    for command in commands:
+        for prefix in prefixes_for(command):
+            start = time.perf_counter()
+            predicted, confidence = predictor.predict(prefix)
+            latencies.append(time.perf_counter() - start)
+            attempts += 1
+            if predicted == command:
+                hits += 1
+            if confidence >= 0.8:
+                confident += 1
+                confident_hits += predicted == command
+        predictor.learn(command)
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1e6
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1e6
+    print(f"\nReplayed {len(commands)} commands, {attempts} predictions")
+    print(f"  latency      p50 {p50:7.1f} us   p99 {p99:7.1f} us   max {latencies[-1] * 1e6:7.1f} us")
+    print(f"  top-1        {hits / attempts:6.1%} of predictions were the exact command")
+    if confident:
+        print(f"  confident    {confident / attempts:6.1%} of predictions had confidence >= 0.8, "
+              f"{confident_hits / confident:6.1%} of those exact")
+    print()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        history = read_history(os.path.expanduser(sys.argv[1]))
+    else:
+        history = synthetic_history()
+    if not history:
+        print("History is empty.")
+        sys.exit(1)
+    run(history)
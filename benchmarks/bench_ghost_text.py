@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Benchmark: keystroke-to-ghost-text latency of the real prompt
+Runs main() on a prompt_toolkit pipe input, types a script of commands one
+key at a time at human speed, and times how long after each keystroke
+AIAutoSuggest first shows ghost text for it. Suggestions come from the
+bundled stub_server (no API key or network) with a lognormal latency; it
+completes to the scripted command, or to a wrong one for a configurable
+share of requests.
+
+Reported (JSON, so runs can be diffed after changing debounce, caching or
+the HTTP client):
+  latency_ms               p50/p95/p99/mean from keystroke to first ghost text
+  coverage                 share of keystrokes that got ghost text before the next key
+  api_calls_per_command    autosuggest requests the stub received per typed command
+  cache_hit_ratio          in-memory suggestion cache hits / lookups during the run
+  stale_rate               share of keystrokes whose ghost text, as last shown
+                           before the next key, no longer matched the command
+                           being typed
+
+Commands are cleared with Ctrl-U rather than run. HOME points at a
+scratch directory, so history, caches and logs start empty.
+
+Usage: python3 benchmarks/bench_ghost_text.py [--rounds N] [--latency-ms MS] [--output FILE]
+Example: python3 benchmarks/bench_ghost_text.py --rounds 2 --latency-ms 250 --accuracy 0.8
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_server import StubServer
+
+COMMANDS = [
+    "git status",
+    "git log --oneline -10",
+    "git commit -am 'fix typo'",
+    "docker ps -a",
+    "docker compose up -d",
+    "ls -la /var/log",
+    "grep -rn TODO src/",
+    "find . -name '*.py' -mtime -1",
+    "tar -czf backup.tar.gz project/",
+    "kubectl get pods -n default",
+    "python3 -m http.server 8000",
+    "ssh user@example.com",
+    "du -sh * | sort -h",
+    "curl -s https://example.com | head",
+    "systemctl status nginx",
+]
+PROMPT_PREFIX = "Complete this shell command (respond with only the completed command, no explanations): "
+
+
+class Typist:
+    """Stub responder: completes typed prefixes to the scripted commands, or wrongly."""
+
+    def __init__(self, commands, accuracy, seed):
+        self.commands = commands
+        self.accuracy = accuracy
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.autosuggest_calls = 0
+
+    def __call__(self, prompt):
+        if not prompt.startswith(PROMPT_PREFIX):
+            return None  # Connection test etc.: the stub's built-in answers
+        typed = prompt[len(PROMPT_PREFIX):]
+        with self.lock:
+            self.autosuggest_calls += 1
+            correct = self.rng.random() < self.accuracy
+        matches = [c for c in self.commands if c.startswith(typed)]
+        if matches and correct:
+            return matches[0]
+        # A plausible but wrong completion
+        return typed + (" --help" if not typed.endswith(" ") else "--version")
+
+
+class Recorder:
+    """Keystroke times and the ghost text shown for each of them."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.target = ""
+        self.text = None
+        self.key_time = 0.0
+        self.first_shown = None
+        self.last_shown = None
+        self.keystrokes = []  # (latency or None, last ghost line or None, target)
+
+    def keystroke(self, text, target):
+        with self.lock:
+            self._close()
+            self.text, self.target, self.key_time = text, target, time.perf_counter()
+            self.first_shown = self.last_shown = None
+
+    def clear(self):
+        with self.lock:
+            self._close()
+            self.text = None
+
+    def shown(self, text, ghost):
+        now = time.perf_counter()
+        with self.lock:
+            if text != self.text:
+                return
+            if self.first_shown is None:
+                self.first_shown = now
+            self.last_shown = text + ghost
+
+    def _close(self):
+        if self.text is not None:
+            latency = None if self.first_shown is None else (self.first_shown - self.key_time) * 1000
+            self.keystrokes.append((latency, self.last_shown, self.target))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run(args):
+    responder = Typist(COMMANDS, args.accuracy, args.seed)
+    stub = StubServer(latency=f"lognormal:{args.latency_ms},{args.jitter}", token_ms=args.token_ms,
+                      responder=responder, seed=args.seed)
+    home = tempfile.mkdtemp(prefix="cliffy-bench-home-")
+    os.environ.update({"HOME": home, "GROQ_API_KEY": "bench", "GROQ_API_ENDPOINT": stub.start()})
+
+    import ai_shell_integration as shell
+    from prompt_toolkit.application import create_app_session
+    from prompt_toolkit.input import create_pipe_input
+    from prompt_toolkit.output import DummyOutput
+
+    recorder = Recorder()
+    original = shell.AIAutoSuggest.get_suggestion
+
+    def traced(self, buffer, document):
+        suggestion = original(self, buffer, document)
+        if suggestion is not None:
+            recorder.shown(document.text, suggestion.text)
+        return suggestion
+
+    shell.AIAutoSuggest.get_suggestion = traced
+    rng = random.Random(args.seed)
+    results = {}
+
+    def typist(pipe):
+        try:
+            time.sleep(1.0)  # Let the first prompt and the startup probe settle
+            cache_before = shell.suggestion_cache.stats()
+            calls_before = responder.autosuggest_calls
+            cancelled_before = stub.stats()["cancelled"]
+            typed_commands = 0
+            for _ in range(args.rounds):
+                for command in COMMANDS:
+                    for end in range(1, len(command) + 1):
+                        recorder.keystroke(command[:end], command)
+                        pipe.send_text(command[end - 1])
+                        time.sleep(max(0.025, rng.gauss(args.key_ms, args.key_ms * 0.35)) / 1000)
+                    time.sleep(args.settle_ms / 1000)
+                    recorder.clear()
+                    pipe.send_text("\x15")  # Ctrl-U: discard the line instead of running it
+                    typed_commands += 1
+                    time.sleep(0.1)
+            cache_after = shell.suggestion_cache.stats()
+            results.update(summarize(recorder, responder.autosuggest_calls - calls_before, typed_commands,
+                                     cache_before, cache_after, stub.stats()["cancelled"] - cancelled_before))
+        finally:
+            pipe.send_text("exit\r")
+
+    try:
+        with create_pipe_input() as pipe:
+            threading.Thread(target=typist, args=(pipe,), daemon=True).start()
+            with create_app_session(input=pipe, output=DummyOutput()), contextlib.redirect_stdout(io.StringIO()):
+                shell.main()
+    finally:
+        stub.stop()
+        shutil.rmtree(home, ignore_errors=True)
+
+    results["config"] = {
+        "rounds": args.rounds, "commands": len(COMMANDS), "key_ms": args.key_ms,
+        "latency_ms": args.latency_ms, "jitter": args.jitter, "token_ms": args.token_ms,
+        "accuracy": args.accuracy, "seed": args.seed,
+        "debounce_ms": shell.SUGGESTION_DEBOUNCE * 1000, "streaming": shell.STREAM_SUGGESTIONS,
+        "cache_policy": shell.SUGGESTION_CACHE_POLICY,
+    }
+    return results
+
+
+def summarize(recorder, api_calls, typed_commands, cache_before, cache_after, cancelled):
+    keystrokes = recorder.keystrokes
+    latencies = [latency for latency, _, _ in keystrokes if latency is not None]
+    shown = [(line, target) for _, line, target in keystrokes if line is not None]
+    stale = sum(1 for line, target in shown if not target.startswith(line))
+    lookups = (cache_after["hits"] - cache_before["hits"]) + (cache_after["misses"] - cache_before["misses"])
+    return {
+        "keystrokes": len(keystrokes),
+        "coverage": round(len(latencies) / len(keystrokes), 4) if keystrokes else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 1),
+            "p95": round(percentile(latencies, 0.95), 1),
+            "p99": round(percentile(latencies, 0.99), 1),
+            "mean": round(sum(latencies) / len(latencies), 1),
+        } if latencies else None,
+        "api_calls": api_calls,
+        "api_calls_per_command": round(api_calls / typed_commands, 2) if typed_commands else 0.0,
+        "api_streams_cancelled": cancelled,
+        "cache_hit_ratio": round((cache_after["hits"] - cache_before["hits"]) / lookups, 4) if lookups else 0.0,
+        "stale_rate": round(stale / len(shown), 4) if shown else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rounds", type=int, default=2, help="times the command script is typed (later rounds hit caches)")
+    parser.add_argument("--key-ms", type=float, default=120, help="mean delay between keystrokes")
+    parser.add_argument("--settle-ms", type=float, default=600, help="pause after the last key of a command")
+    parser.add_argument("--latency-ms", type=float, default=200, help="median stub time to first byte")
+    parser.add_argument("--jitter", type=float, default=0.4, help="sigma of the lognormal latency distribution")
+    parser.add_argument("--token-ms", type=float, default=8, help="delay between streamed chunks")
+    parser.add_argument("--accuracy", type=float, default=0.85, help="share of stub completions that match the script")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
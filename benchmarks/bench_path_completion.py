@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: path completion per keystroke, cached scandir listing vs listdir
+Creates a directory with N entries and completes an increasingly long
+prefix against it, the way complete_while_typing does, comparing the old
+os.listdir + os.path.isdir per entry with DirectoryCache.complete.
+
+Usage: python3 benchmarks/bench_path_completion.py [entries ...]
+Example: python3 benchmarks/bench_path_completion.py 1000 20000
+"""
+
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dir_cache import DirectoryCache
+
+PREFIXES = ["", "f", "fi", "fil", "file", "file_1", "file_12", "file_123"]
+
+
+def listdir_complete(path, prefix):
+    out = []
+    for item in os.listdir(path):
+        if item.startswith(prefix):
+            out.append(item + "/" if os.path.isdir(os.path.join(path, item)) else item)
+    return out
+
+
+def cached_complete(cache, path, prefix):
+    return [e.name + "/" if e.is_dir else e.name for e in cache.complete(path, prefix)]
+
+
+def measure(run, rounds=20):
+    latencies = []
+    for _ in range(rounds):
+        for prefix in PREFIXES:
+            start = time.perf_counter()
+            run(prefix)
+            latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000, max(latencies) * 1000
+
+
+def main(sizes):
+    print(f"\n{'entries':>8} {'mode':<10} {'p50 ms':>8} {'max ms':>8}")
+    for size in sizes:
+        root = tempfile.mkdtemp(prefix="cliffy-bench-")
+        try:
+            for i in range(size):
+                if i % 10 == 0:
+                    os.mkdir(os.path.join(root, f"dir_{i}"))
+                else:
+                    open(os.path.join(root, f"file_{i}"), "w").close()
+            cache = DirectoryCache()
+            for name, run in [
+                ("listdir", lambda p: listdir_complete(root, p)),
+                ("cached", lambda p: cached_complete(cache, root, p)),
+            ]:
+                p50, worst = measure(run)
+                print(f"{size:>8} {name:<10} {p50:>8.3f} {worst:>8.3f}")
+        finally:
+            shutil.rmtree(root)
+    print()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [500, 5000, 20000])
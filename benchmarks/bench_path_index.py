@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: fuzzy path index build, incremental refresh and query latency
+Creates a synthetic source tree with N files (plus a .gitignore'd build
+directory), then reports the initial walk, a refresh with nothing changed,
+a refresh after touching a few directories, and per-keystroke query times
+while typing a few fuzzy queries one character at a time.
+
+Usage: python3 benchmarks/bench_path_index.py [files] [root]
+Example: python3 benchmarks/bench_path_index.py 200000
+         python3 benchmarks/bench_path_index.py 0 ~/src/some-repo   (index an existing tree)
+"""
+
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from path_index import PathIndex
+
+WORDS = ["src", "lib", "core", "utils", "config", "model", "view", "api", "db", "docs",
+         "main", "index", "helper", "service", "client", "server", "parser", "cache"]
+QUERIES = ["helperserv", "cfgparse", "srcmainidx", "zzqx"]
+
+
+def make_tree(root, files):
+    rng = random.Random(7)
+    dirs = [""]
+    for i in range(max(1, files // 40)):
+        parent = rng.choice(dirs)
+        path = os.path.join(parent, f"{rng.choice(WORDS)}{i}")
+        os.makedirs(os.path.join(root, path), exist_ok=True)
+        dirs.append(path)
+    for i in range(files):
+        name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{i}.py"
+        open(os.path.join(root, rng.choice(dirs), name), "w").close()
+    os.makedirs(os.path.join(root, "build"))
+    for i in range(files // 10):
+        open(os.path.join(root, "build", f"out_{i}.o"), "w").close()
+    with open(os.path.join(root, ".gitignore"), "w") as f:
+        f.write("/build/\n*.o\n")
+    return dirs
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main(files, root):
+    temp = None
+    if root is None:
+        temp = root = tempfile.mkdtemp(prefix="cliffy-bench-")
+        print(f"Creating {files} files under {root} ...")
+        dirs = make_tree(root, files)
+    else:
+        dirs = [""]
+    try:
+        index = PathIndex(root)
+        build = timed(lambda: (index.ensure_fresh(), index.wait()))
+        print(f"\nIndexed {index.size} paths{' (truncated)' if index.truncated else ''}")
+        print(f"initial walk          {build:>9.1f} ms")
+
+        index._last_refresh = 0
+        print(f"refresh, no changes   {timed(lambda: (index.ensure_fresh(), index.wait())):>9.1f} ms")
+
+        for path in dirs[1:6]:
+            open(os.path.join(root, path, "new_file.py"), "w").close()
+        index._last_refresh = 0
+        print(f"refresh, 5 dirs dirty {timed(lambda: (index.ensure_fresh(), index.wait())):>9.1f} ms")
+
+        print(f"\n{'query':<14} {'p50 ms':>8} {'max ms':>8}  top match")
+        for query in QUERIES:
+            latencies = []
+            for end in range(1, len(query) + 1):
+                start = time.perf_counter()
+                results = index.query(query[:end], 20)
+                latencies.append((time.perf_counter() - start) * 1000)
+            top = results[0] if results else "-"
+            print(f"{query:<14} {statistics.median(latencies):>8.2f} {max(latencies):>8.2f}  {top}")
+        print()
+    finally:
+        if temp:
+            shutil.rmtree(temp)
+
+
+if __name__ == "__main__":
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    root = os.path.abspath(os.path.expanduser(sys.argv[2])) if len(sys.argv) > 2 else None
+    main(files, root)
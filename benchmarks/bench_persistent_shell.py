@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-command overhead of the persistent bash coprocess vs bash -c
+Runs the same command N times both ways and reports p50/p99 wall time,
+including the cwd/environment sync the coprocess does after every command.
+
+Usage: python3 benchmarks/bench_persistent_shell.py [runs] [command]
+Example: python3 benchmarks/bench_persistent_shell.py 500 "ls >/dev/null"
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistent_shell import PersistentShell
+
+
+def measure(run, runs):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99) - 1] * 1000
+
+
+def main(runs, command):
+    shell = PersistentShell()
+    shell.run("true")  # Spawn outside the timed loop
+    try:
+        results = [
+            ("bash -c", measure(lambda: subprocess.run(["bash", "-c", command], check=False), runs)),
+            ("coprocess", measure(lambda: shell.run(command), runs)),
+        ]
+    finally:
+        shell.close()
+
+    print(f"\n{runs} runs of {command!r}")
+    print(f"{'mode':<12} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, (p50, p99) in results:
+        print(f"{name:<12} {p50:>8.2f} {p99:>8.2f}")
+    print()
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    command = sys.argv[2] if len(sys.argv) > 2 else "true"
+    main(runs, command)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: trie-backed SuggestionCache vs the old linear scan
+Usage: python3 benchmarks/bench_suggestion_cache.py [entries ...]
+Example: python3 benchmarks/bench_suggestion_cache.py 1000 10000 50000
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suggestion_cache import SuggestionCache
+
+COMMANDS = [
+    "git status --short", "git commit -m 'wip'", "git push origin main",
+    "docker compose up -d", "docker ps -a", "kubectl get pods -n kube-system",
+    "ls -la", "tail -f /var/log/syslog", "grep -rn TODO src", "ssh deploy@web",
+    "systemctl restart nginx", "journalctl -u nginx -f", "python3 -m http.server",
+]
+
+
+def linear_scan(cache, text):
+    """The pre-trie get_cached_suggestion_for() body."""
+    if text in cache:
+        return cache[text]
+    best_suggestion = ""
+    best_key_len = -1
+    for key, suggestion in cache.items():
+        if not suggestion:
+            continue
+        if suggestion.startswith(text) and len(key) > best_key_len:
+            best_suggestion = suggestion
+            best_key_len = len(key)
+    return best_suggestion
+
+
+def build_entries(count, rng):
+    entries = {}
+    while len(entries) < count:
+        command = f"{rng.choice(COMMANDS)} {rng.randrange(count * 10)}"
+        cut = rng.randint(2, len(command) - 1)
+        entries[command[:cut] + f"#{len(entries)}"] = command
+    return entries
+
+
+def build_queries(entries, count, rng):
+    suggestions = list(entries.values())
+    queries = []
+    for _ in range(count):
+        suggestion = rng.choice(suggestions)
+        queries.append(suggestion[:rng.randint(2, len(suggestion))])
+        queries.append(f"{rng.choice(COMMANDS)[:6]} nomatch{rng.random()}")
+    return queries
+
+
+def time_lookups(lookup, cache, queries):
+    start = time.perf_counter()
+    for query in queries:
+        lookup(cache, query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def run(count, query_count=200):
+    rng = random.Random(count)
+    entries = build_entries(count, rng)
+    queries = build_queries(entries, query_count, rng)
+
+    trie = SuggestionCache(max_entries=None, max_bytes=None)  # Unbounded: compare against the full scan
+    start = time.perf_counter()
+    for key, suggestion in entries.items():
+        trie[key] = suggestion
+    build_seconds = time.perf_counter() - start
+
+    mismatches = sum(1 for q in queries if trie.lookup(q) != linear_scan(entries, q))
+    scan_us = time_lookups(linear_scan, entries, queries) * 1e6
+    trie_us = time_lookups(SuggestionCache.lookup, trie, queries) * 1e6
+
+    print(f"  {count:>7} entries | scan {scan_us:10.1f} us/lookup | trie {trie_us:7.2f} us/lookup "
+          f"| {scan_us / trie_us:8.1f}x | build {build_seconds * 1000:7.1f} ms | mismatches {mismatches}")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 50000]
+    print("\nSuggestion cache lookup: linear scan vs trie\n")
+    for size in sizes:
+        run(size)
+    print()
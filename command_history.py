@@ -0,0 +1,145 @@
+"""
+Cliffy Command History
+Records executed commands and serves fish-style prefix completions locally.
+
+History file format is one command per line as
+    <unix timestamp>\t<cwd>\t<command>
+Lines without tabs are read as bare commands, so an existing bash-style
+history file can be used as a starting point.
+
+Candidates are found by binary search over the sorted unique commands and
+ranked by frequency with an exponential recency decay; commands that were
+run in the current directory get a boost.
+"""
+
+import bisect
+import math
+import os
+import threading
+import time
+
+HALF_LIFE = 7 * 24 * 3600   # seconds for a command's weight to halve
+DIR_BOOST = 2.0             # extra weight per run in the current directory
+MIN_SCORE = 0.5             # weaker matches fall through to the AI
+MAX_SCAN = 5000             # candidates examined per lookup
+
+
+def _private_opener(path, flags):
+    # Commands can carry secrets (export TOKEN=..., mysql -p...): owner-only, like bash's HISTFILE
+    return os.open(path, flags, 0o600)
+
+
+class _Entry:
+    __slots__ = ("count", "last_used", "dirs")
+
+    def __init__(self):
+        self.count = 0
+        self.last_used = 0.0
+        self.dirs = {}
+
+
+class CommandHistory:
+    """In-memory index of executed commands backed by an append-only file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.loaded = False
+        self._entries = {}
+        self._sorted = []
+        self._lock = threading.Lock()
+
+    def ensure_file(self):
+        """Create the history file with mode 0600, tightening an existing one."""
+        with open(self.path, "a", encoding="utf-8", opener=_private_opener):
+            pass
+        os.chmod(self.path, 0o600)
+
+    def load(self):
+        """Read the history file into the index (safe to call from a thread).
+
+        Returns the commands in file order so other models can replay them.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            lines = []
+        commands = []
+        with self._lock:
+            for line in lines:
+                parts = line.split("\t", 2)
+                if len(parts) == 3:
+                    try:
+                        timestamp = float(parts[0])
+                    except ValueError:
+                        continue
+                    self._add(parts[2], parts[1], timestamp, keep_sorted=False)
+                    commands.append(parts[2])
+                elif line.strip():
+                    self._add(line, "", 0.0, keep_sorted=False)
+                    commands.append(line)
+            self._sorted = sorted(self._entries)
+            self.loaded = True
+        return commands
+
+    def record(self, command, cwd=None, timestamp=None):
+        """Add an executed command to the index and append it to the file."""
+        command = command.strip()
+        if not command or "\n" in command:
+            return
+        if cwd is None:
+            try:
+                cwd = os.getcwd()
+            except OSError:
+                cwd = ""  # Deleted directory: keep the command, without a directory
+        timestamp = timestamp if timestamp is not None else time.time()
+        with self._lock:
+            self._add(command, cwd, timestamp)
+        try:
+            with open(self.path, "a", encoding="utf-8", opener=_private_opener) as f:
+                f.write(f"{timestamp:.0f}\t{cwd}\t{command}\n")
+        except OSError:
+            pass
+
+    def suggest(self, prefix, cwd=None, now=None):
+        """Best previously executed command extending prefix, or "" if none is good enough."""
+        now = now if now is not None else time.time()
+        best, best_score = "", MIN_SCORE
+        with self._lock:
+            start = bisect.bisect_left(self._sorted, prefix)
+            for i in range(start, min(len(self._sorted), start + MAX_SCAN)):
+                command = self._sorted[i]
+                if not command.startswith(prefix):
+                    break
+                if command == prefix:
+                    continue
+                score = self._score(self._entries[command], cwd, now)
+                if score > best_score:
+                    best, best_score = command, score
+        return best
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _add(self, command, cwd, timestamp, keep_sorted=True):
+        entry = self._entries.get(command)
+        if entry is None:
+            entry = self._entries[command] = _Entry()
+            if keep_sorted:
+                bisect.insort(self._sorted, command)
+        entry.count += 1
+        entry.last_used = max(entry.last_used, timestamp)
+        if cwd:
+            entry.dirs[cwd] = entry.dirs.get(cwd, 0) + 1
+
+    @staticmethod
+    def _score(entry, cwd, now):
+        weight = entry.count
+        if cwd:
+            weight += DIR_BOOST * entry.dirs.get(cwd, 0)
+        if entry.last_used:
+            age = max(0.0, now - entry.last_used)
+            weight *= math.pow(0.5, age / HALF_LIFE)
+        else:
+            weight *= 0.5  # Imported lines carry no timestamp
+        return weight
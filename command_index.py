@@ -0,0 +1,143 @@
+"""
+Cliffy Command Index
+Names of every executable on $PATH (plus shell builtins) for completing
+the command word, the way bash's `hash` table avoids searching PATH.
+
+Each PATH directory's executables are read once with os.scandir and kept
+with the directory's mtime; installing or removing a program bumps it, so
+only that directory is read again. refresh() runs on a worker thread and
+is kicked off when PATH changes or a directory's mtime moved. Lookups
+bisect into a sorted name list; the only filesystem access on that path
+is the staleness check, one stat per PATH directory at most every
+check_interval seconds.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+SHELL_BUILTINS = (
+    "alias", "bg", "bind", "break", "builtin", "cd", "command", "continue", "declare",
+    "dirs", "disown", "echo", "eval", "exec", "exit", "export", "fg", "hash", "help",
+    "history", "jobs", "kill", "popd", "printf", "pushd", "pwd", "read", "readonly",
+    "return", "set", "shift", "shopt", "source", "test", "times", "trap", "type",
+    "ulimit", "umask", "unalias", "unset", "wait",
+)
+
+
+class CommandIndex:
+    """Sorted executable names from $PATH, refreshed per directory mtime."""
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.path = None
+        self.names = []
+        self.locations = {}
+        self.build_seconds = 0.0
+        self._dirs = {}
+        self._last_check = 0.0
+        self._worker = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.path is not None
+
+    def refresh(self):
+        """Re-read PATH directories that changed (all of them the first time)."""
+        start = time.perf_counter()
+        path = os.environ.get("PATH", "")
+        dirs = []
+        for entry in path.split(os.pathsep):
+            directory = os.path.abspath(entry) if entry else os.getcwd()
+            if directory not in dirs:
+                dirs.append(directory)
+        listings = {}
+        for directory in dirs:
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            cached = self._dirs.get(directory)
+            listings[directory] = cached if cached and cached[0] == mtime else (mtime, _executables(directory))
+        # Earlier PATH entries win, as in command lookup
+        locations = {}
+        for directory in reversed(dirs):
+            if directory in listings:
+                for name in listings[directory][1]:
+                    locations[name] = os.path.join(directory, name)
+        names = sorted(set(locations).union(SHELL_BUILTINS))
+        with self._lock:
+            self._dirs = listings
+            self.locations = locations
+            self.names = names
+            self.path = path
+            self._last_check = time.monotonic()
+            self.build_seconds = time.perf_counter() - start
+
+    def refresh_async(self):
+        """Start refresh() on a worker thread unless one is already running."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._refresh_quietly, name="cliffy-command-index", daemon=True)
+            self._worker.start()
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception:
+            pass  # Keep serving the previous names
+
+    def wait(self, timeout=None):
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def sync_path(self):
+        """Refresh in the background if PATH was changed (e.g. by `export PATH=...`)."""
+        if self.path is not None and os.environ.get("PATH", "") != self.path:
+            self.refresh_async()
+
+    def _check(self):
+        """Throttled staleness check: PATH changed, or a PATH directory's mtime moved."""
+        if self.path is None:
+            return self.refresh_async()
+        if time.monotonic() - self._last_check < self.check_interval:
+            return
+        self._last_check = time.monotonic()
+        if os.environ.get("PATH", "") != self.path:
+            return self.refresh_async()
+        for directory, (mtime, _) in list(self._dirs.items()):
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return self.refresh_async()
+            except OSError:
+                return self.refresh_async()
+
+    def complete(self, prefix, limit=200):
+        """Command names starting with prefix, in sorted order (at most limit)."""
+        self._check()
+        names = self.names
+        index = bisect.bisect_left(names, prefix)
+        matches = []
+        while index < len(names) and len(matches) < limit and names[index].startswith(prefix):
+            matches.append(names[index])
+            index += 1
+        return matches
+
+
+def _executables(directory):
+    names = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_file() and os.access(entry.path, os.X_OK):
+                        names.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return names
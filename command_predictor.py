@@ -0,0 +1,119 @@
+"""
+Cliffy Command Predictor
+Offline token-level n-gram (Markov) model over executed commands.
+
+Each command is split into whitespace tokens and framed with start/end
+markers. Counts are kept for contexts of up to ORDER-1 preceding tokens,
+plus one extra context that includes the first word of the previous
+command (so "git add" after "git status" is learned separately). Queries
+back off from the longest context to shorter ones and extend the typed
+text greedily, one token at a time, multiplying step probabilities into a
+confidence score. Everything is dict lookups, so a prediction takes
+microseconds.
+"""
+
+import threading
+
+ORDER = 3           # tokens of context (including the token being predicted)
+MAX_EXTEND = 8      # tokens appended per prediction
+MIN_STEP_PROB = 0.3 # stop extending once the next token is this uncertain
+START = "<s>"
+END = "</s>"
+
+
+class CommandPredictor:
+    """Incrementally trained n-gram model for whole-command completion."""
+
+    def __init__(self, order=ORDER):
+        self.order = order
+        self._counts = {}   # context tuple -> {token: count}
+        self._totals = {}   # context tuple -> sum of counts
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def learn(self, command, previous=None):
+        """Train on one executed command; previous defaults to the last one learned."""
+        tokens = command.split()
+        if not tokens:
+            return
+        with self._lock:
+            prev_head = self._head(previous if previous is not None else self._previous)
+            history = [START]
+            for token in tokens + [END]:
+                for context in self._contexts(history, prev_head):
+                    bucket = self._counts.setdefault(context, {})
+                    bucket[token] = bucket.get(token, 0) + 1
+                    self._totals[context] = self._totals.get(context, 0) + 1
+                history.append(token)
+            self._previous = command
+
+    def train(self, commands):
+        """Train on an ordered sequence of commands."""
+        for command in commands:
+            self.learn(command)
+
+    def predict(self, text, previous=None):
+        """Return (completed command, confidence) for the typed text, or ("", 0.0)."""
+        tokens = text.split()
+        if not tokens:
+            return "", 0.0
+        partial = "" if text[-1:].isspace() else tokens.pop()
+        with self._lock:
+            prev_head = self._head(previous if previous is not None else self._previous)
+            history = [START] + tokens
+            completion = text
+            confidence = 1.0
+
+            token, prob = self._best_next(history, prev_head, partial)
+            if token is None or token == END:
+                return "", 0.0
+            completion += token[len(partial):]
+            confidence *= prob
+            history.append(token)
+
+            for _ in range(MAX_EXTEND):
+                token, prob = self._best_next(history, prev_head, "")
+                if token is None or token == END or prob < MIN_STEP_PROB:
+                    break
+                completion += " " + token
+                confidence *= prob
+                history.append(token)
+
+        if completion == text:
+            return "", 0.0
+        return completion, confidence
+
+    def _best_next(self, history, prev_head, partial):
+        """Most likely next token starting with partial, backing off to shorter contexts."""
+        for context in self._contexts(history, prev_head):
+            bucket = self._counts.get(context)
+            if not bucket:
+                continue
+            if partial:
+                matches = {t: c for t, c in bucket.items() if t != END and t.startswith(partial)}
+                total = sum(matches.values())
+            else:
+                matches = bucket
+                total = self._totals[context]
+            if not matches:
+                continue
+            token = max(matches, key=matches.get)
+            return token, matches[token] / total
+        return None, 0.0
+
+    def _contexts(self, history, prev_head):
+        """Contexts from most to least specific."""
+        recent = tuple(history[-(self.order - 1):])
+        contexts = []
+        if prev_head:
+            contexts.append((prev_head,) + recent)
+        for size in range(len(recent), 0, -1):
+            contexts.append(recent[-size:])
+        return contexts
+
+    @staticmethod
+    def _head(command):
+        if not command:
+            return None
+        words = command.split()
+        return f"<prev:{words[0]}>" if words else None
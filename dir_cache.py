@@ -0,0 +1,110 @@
+"""
+Cliffy Directory Cache
+Directory listings for path completion, read once with os.scandir and
+reused until the directory's mtime changes (adding, removing or renaming
+an entry bumps it), so completing while typing costs one stat() per
+keystroke instead of a full listing plus a stat per entry.
+
+Each listing is sorted once and carries per-entry flags computed at read
+time: is_dir comes from the d_type scandir already has, and hidden
+(dotfile) / ignored (matches an ignore pattern) are evaluated once, not
+per keystroke. Prefix lookups bisect into the sorted names.
+"""
+
+import bisect
+import fnmatch
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+DEFAULT_IGNORE = ("__pycache__", "*.pyc", ".git", ".DS_Store")
+
+Entry = namedtuple("Entry", ["name", "is_dir", "hidden", "ignored"])
+
+
+class Listing:
+    """One directory's sorted entries, keyed by the mtime they were read at."""
+
+    __slots__ = ("mtime", "entries", "names")
+
+    def __init__(self, mtime, entries):
+        self.mtime = mtime
+        self.entries = entries
+        self.names = [entry.name for entry in entries]
+
+    def with_prefix(self, prefix):
+        """Yield entries whose name starts with prefix, in sorted order."""
+        index = bisect.bisect_left(self.names, prefix)
+        while index < len(self.names) and self.names[index].startswith(prefix):
+            yield self.entries[index]
+            index += 1
+
+
+class DirectoryCache:
+    """LRU cache of Listing objects, validated against the directory mtime."""
+
+    def __init__(self, max_dirs=64, ignore=DEFAULT_IGNORE):
+        self.max_dirs = max_dirs
+        self.ignore = tuple(ignore)
+        self.hits = 0
+        self.misses = 0
+        self._listings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def listing(self, path):
+        """Listing for path (re-read if its mtime changed); raises OSError."""
+        key = os.path.abspath(path)
+        mtime = os.stat(key).st_mtime_ns
+        with self._lock:
+            cached = self._listings.get(key)
+            if cached is not None and cached.mtime == mtime:
+                self._listings.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        listing = Listing(mtime, self._read(key))
+        with self._lock:
+            self._listings[key] = listing
+            self._listings.move_to_end(key)
+            while len(self._listings) > self.max_dirs:
+                self._listings.popitem(last=False)
+        return listing
+
+    def _read(self, path):
+        entries = []
+        with os.scandir(path) as it:
+            for dirent in it:
+                name = dirent.name
+                try:
+                    is_dir = dirent.is_dir()  # d_type; only symlinks and DT_UNKNOWN need a stat
+                except OSError:
+                    is_dir = False
+                ignored = any(fnmatch.fnmatch(name, pattern) for pattern in self.ignore)
+                entries.append(Entry(name, is_dir, name.startswith("."), ignored))
+        entries.sort(key=lambda entry: entry.name)
+        return entries
+
+    def complete(self, path, prefix, limit=200):
+        """Yield up to limit matching entries of path lazily.
+
+        Hidden entries only match a prefix starting with ".", and ignored
+        entries only match once something has been typed.
+        """
+        show_hidden = prefix.startswith(".")
+        count = 0
+        for entry in self.listing(path).with_prefix(prefix):
+            if entry.hidden and not show_hidden:
+                continue
+            if entry.ignored and not prefix:
+                continue
+            yield entry
+            count += 1
+            if count >= limit:
+                return
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(os.path.abspath(path), None)
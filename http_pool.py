@@ -0,0 +1,78 @@
+"""
+Cliffy HTTP Pool
+requests Session with a keep-alive connection pool whose connections
+record how long connect() (TCP + TLS) took for the calling thread.
+
+Importing requests costs ~100 ms, so ai_shell_integration imports this
+module on the first API call rather than at startup.
+"""
+
+import threading
+import time
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+# Set by connect(); None afterwards means the request reused a pooled connection
+connect_timing = threading.local()
+
+
+class TimedHTTPConnection(urllib3.connection.HTTPConnection):
+    """HTTP connection that records how long connect() took for the calling thread."""
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        connect_timing.seconds = time.perf_counter() - start
+
+
+class TimedHTTPSConnection(urllib3.connection.HTTPSConnection):
+    """HTTPS connection that records TCP+TLS setup time for the calling thread."""
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        connect_timing.seconds = time.perf_counter() - start
+
+
+class TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools use the timed connection classes."""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+def is_timeout(error):
+    """True for connect/read timeouts, whether requests or urllib3 raised them."""
+    return isinstance(error, (requests.Timeout, urllib3.exceptions.TimeoutError, TimeoutError))
+
+
+def bytes_received(response):
+    """Bytes read off the wire for response so far (before content decoding)."""
+    try:
+        return response.raw.tell()
+    except Exception:
+        return 0
+
+
+def create_session(api_key, pool_size):
+    """A Session with the timed pool mounted for http and https."""
+    session = requests.Session()
+    adapter = PooledHTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    })
+    return session
@@ -0,0 +1,294 @@
+"""
+Cliffy Metrics
+In-process counters and latency histograms: API requests per call type
+(autosuggest, safety, explain, codegen, ...), time spent in instrumented
+functions, and hit/miss counters of the caches. `status` prints them and
+an optional exporter thread rewrites a file with them every few seconds,
+in the Prometheus text format (for node_exporter's textfile collector) or
+as JSON.
+
+Histograms have fixed buckets, so recording a value is one bisect and two
+increments under a lock; quantiles are estimated from the buckets. Cache
+counters are not copied here: each cache registers a callable that
+returns its own (hits, misses) and it is read when a snapshot is taken.
+"""
+
+import atexit
+import bisect
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# Upper bounds in seconds; the last bucket is +Inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+FORMATS = ("prometheus", "json")
+
+
+class Histogram:
+    """Cumulative-on-export histogram of durations in seconds."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate of the q-quantile, interpolated inside its bucket (None if empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = BUCKETS[index - 1] if index else 0.0
+                high = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+                return low + (high - low) * max(0.0, rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], self.counts)),
+        }
+
+
+class _Calls:
+    """Counters for one API call type."""
+
+    __slots__ = ("requests", "errors", "timeouts", "cancelled", "bytes_sent", "bytes_received", "latency")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = Histogram()
+
+
+class Timer:
+    """Wall-clock timer that can leave out stretches spent waiting (e.g. for the user)."""
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = time.perf_counter()
+        self.excluded = 0.0
+
+    @contextlib.contextmanager
+    def paused(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.excluded += time.perf_counter() - start
+
+    def stop(self):
+        self.metrics.observe(self.name, time.perf_counter() - self.start - self.excluded)
+
+
+class Metrics:
+    """Registry of API call counters, function timers and cache counters."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.calls = {}
+        self.timers = {}
+        self._caches = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+
+    def observe_request(self, call_type, seconds, error=False, timeout=False, bytes_sent=0, bytes_received=0):
+        """Record one API request; error covers non-200 answers and exceptions alike."""
+        with self._lock:
+            calls = self.calls.get(call_type)
+            if calls is None:
+                calls = self.calls[call_type] = _Calls()
+            calls.requests += 1
+            calls.errors += bool(error)
+            calls.timeouts += bool(timeout)
+            calls.bytes_sent += bytes_sent
+            calls.bytes_received += bytes_received
+            calls.latency.observe(seconds)
+
+    def observe_cancel(self, call_type):
+        """A streamed request was abandoned because its answer was no longer wanted."""
+        with self._lock:
+            calls = self.calls.get(call_type)
+            if calls is None:
+                calls = self.calls[call_type] = _Calls()
+            calls.cancelled += 1
+
+    def observe(self, name, seconds):
+        """Record time spent in the named function."""
+        with self._lock:
+            histogram = self.timers.get(name)
+            if histogram is None:
+                histogram = self.timers[name] = Histogram()
+            histogram.observe(seconds)
+
+    def timed(self, name):
+        """Decorator recording the wall-clock time of each call under name."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def timer(self, name):
+        """A started Timer for name; call stop() to record it."""
+        return Timer(self, name)
+
+    def register_cache(self, name, counters):
+        """counters() returns the cache's current (hits, misses)."""
+        self._caches[name] = counters
+
+    def cache_counters(self):
+        result = {}
+        for name, counters in list(self._caches.items()):
+            try:
+                hits, misses = counters()
+            except Exception:
+                continue
+            lookups = hits + misses
+            result[name] = {"hits": hits, "misses": misses, "hit_rate": hits / lookups if lookups else 0.0}
+        return result
+
+    def snapshot(self):
+        """Plain-dict copy of every metric, safe to serialize."""
+        with self._lock:
+            calls = {
+                call_type: {
+                    "requests": c.requests,
+                    "errors": c.errors,
+                    "timeouts": c.timeouts,
+                    "cancelled": c.cancelled,
+                    "bytes_sent": c.bytes_sent,
+                    "bytes_received": c.bytes_received,
+                    "latency_seconds": c.latency.summary(),
+                }
+                for call_type, c in sorted(self.calls.items())
+            }
+            timers = {name: h.summary() for name, h in sorted(self.timers.items())}
+        return {
+            "timestamp": time.time(),
+            "started": self.started,
+            "pid": os.getpid(),
+            "api": calls,
+            "functions": timers,
+            "caches": self.cache_counters(),
+        }
+
+    def prometheus(self):
+        """The snapshot in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        # Every series carries the pid, so files of concurrent shells never collide
+        pid = f'pid="{snap["pid"]}"'
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, label, key, summary):
+            cumulative = 0
+            for bound, n in summary["buckets"].items():
+                cumulative += n
+                lines.append(f'{name}_bucket{{{pid},{label}="{key}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{pid},{label}="{key}"}} {summary["sum"]}')
+            lines.append(f'{name}_count{{{pid},{label}="{key}"}} {summary["count"]}')
+
+        family("cliffy_start_time_seconds", "gauge", "Unix time the shell started.")
+        lines.append(f'cliffy_start_time_seconds{{{pid}}} {snap["started"]:.3f}')
+        for field, help_text in (
+            ("requests", "API requests by call type."),
+            ("errors", "API requests that failed (non-200 or exception)."),
+            ("timeouts", "API requests that timed out."),
+            ("cancelled", "Streamed API requests abandoned as stale or diverging."),
+            ("bytes_sent", "Request body bytes sent to the API."),
+            ("bytes_received", "Response bytes received from the API."),
+        ):
+            name = f"cliffy_api_{field}_total"
+            family(name, "counter", help_text)
+            for call_type, calls in snap["api"].items():
+                lines.append(f'{name}{{{pid},call="{call_type}"}} {calls[field]}')
+        family("cliffy_api_latency_seconds", "histogram",
+               "API latency: full response, or first token for streams.")
+        for call_type, calls in snap["api"].items():
+            histogram("cliffy_api_latency_seconds", "call", call_type, calls["latency_seconds"])
+        family("cliffy_function_seconds", "histogram", "Wall-clock time spent in instrumented functions.")
+        for name, summary in snap["functions"].items():
+            histogram("cliffy_function_seconds", "function", name, summary)
+        for field in ("hits", "misses"):
+            name = f"cliffy_cache_{field}_total"
+            family(name, "counter", f"Cache {field} by cache.")
+            for cache, counters in snap["caches"].items():
+                lines.append(f'{name}{{{pid},cache="{cache}"}} {counters[field]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, fmt="prometheus"):
+        """Atomically replace path with the current metrics (readers never see a partial file)."""
+        text = json.dumps(self.snapshot(), indent=2) + "\n" if fmt == "json" else self.prometheus()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w") as f:
+            f.write(text)
+        os.replace(temp, path)
+
+    def start_export(self, path, fmt="prometheus", interval=15.0, on_error=None):
+        """Rewrite path every interval seconds on a daemon thread; remove it at exit.
+
+        A file left behind by a shell that exited would keep being scraped
+        as if that shell were still running.
+        """
+        if self._exporter is not None:
+            return
+        stop = threading.Event()
+
+        def export():
+            try:
+                self.write(path, fmt)
+            except Exception as e:
+                if on_error is not None:
+                    on_error(e)
+
+        def loop():
+            export()
+            while not stop.wait(interval):
+                export()
+
+        def remove():
+            stop.set()
+            self._exporter.join(1.0)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        self._exporter = threading.Thread(target=loop, name="cliffy-metrics-export", daemon=True)
+        self._exporter.start()
+        atexit.register(remove)
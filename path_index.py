@@ -0,0 +1,531 @@
+"""
+Cliffy Path Index
+Background index of every path under a root directory for fuzzy path
+completion, so a file several levels deep is one query away instead of a
+TAB round per directory.
+
+The tree is walked once with os.scandir on a worker thread, bounded by
+max_entries, skipping hidden directories, symlinked directories and
+anything matched by a .gitignore on the way down. Each indexed directory
+remembers its mtime (and its .gitignore's); a refresh only re-scans the
+directories whose mtime changed, dropping removed subtrees, walking new
+ones and patching the searchable snapshot in place.
+
+Each character has a bitset (one big int) of the paths containing it, so
+ANDing the query's bitsets leaves only paths with all of its characters.
+Those are checked for the in-order (subsequence) match with a regex in C,
+basenames first and whole paths only when basenames give too few results,
+then ranked. Typing one more character re-checks only the previous matches.
+"""
+
+import heapq
+import operator
+import os
+import re
+import threading
+import time
+from collections import deque
+from itertools import compress, islice, repeat
+
+ALWAYS_SKIP = {".git", ".hg", ".svn"}
+MAX_CANDIDATES = 50000
+SCORED_CANDIDATES = 2000
+PREWARM_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789._-/"
+
+
+class IgnoreRules:
+    """The .gitignore rules in effect for one directory (parent rules first)."""
+
+    __slots__ = ("rules",)
+
+    def __init__(self, rules=()):
+        self.rules = tuple(rules)
+
+    def extended(self, base, text, unanchored_only=False):
+        """These rules plus the ones in a .gitignore found at base (relative to the root)."""
+        rules = list(self.rules)
+        for line in text.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line  # A leading or middle slash anchors to the .gitignore's directory
+            line = line.lstrip("/")
+            if not line:
+                continue
+            if line.startswith("**/"):
+                line, anchored = line[3:], "/" in line[3:]
+            if anchored and unanchored_only:
+                continue
+            regex = _glob_regex(line)
+            rules.append((regex, negate, dir_only, anchored, base))
+        return IgnoreRules(rules)
+
+    def ignored(self, relpath, name, is_dir):
+        """Last matching rule wins, as in git."""
+        for regex, negate, dir_only, anchored, base in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if anchored:
+                if base:
+                    if not relpath.startswith(base + "/"):
+                        continue
+                    target = relpath[len(base) + 1:]
+                else:
+                    target = relpath
+            else:
+                target = name
+            if regex.match(target):
+                return not negate
+        return False
+
+
+class _Dir:
+    __slots__ = ("mtime", "ignore_mtime", "files", "subdirs", "rules")
+
+    def __init__(self, mtime, ignore_mtime, files, subdirs, rules):
+        self.mtime = mtime
+        self.ignore_mtime = ignore_mtime
+        self.files = files
+        self.subdirs = subdirs
+        self.rules = rules
+
+
+def _glob_regex(pattern):
+    """Compile a gitignore glob: * and ? stay within one path component, ** spans them."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if pattern.startswith("/**/", i):
+            out.append("(?:/.*)?/")
+            i += 4
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if ch == "*":
+            out.append("[^/]*")
+        elif ch == "?":
+            out.append("[^/]")
+        elif ch == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(ch))
+            else:
+                body = pattern[i + 1:end]
+                out.append("[^" + body[1:] + "]" if body.startswith("!") else "[" + body + "]")
+                i = end
+        else:
+            out.append(re.escape(ch))
+        i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+def _join(reldir, name):
+    return f"{reldir}/{name}" if reldir else name
+
+
+def _entries(reldir, node):
+    """The indexed paths a directory contributes (directories end with /)."""
+    return [_join(reldir, name) for name in node.files] + [_join(reldir, name) + "/" for name in node.subdirs]
+
+
+def _inherited_rules(root):
+    """Unanchored rules from .gitignore files above root, up to the repository top.
+
+    Anchored patterns are relative to a directory outside the index and are
+    skipped; outside a git repository nothing is inherited.
+    """
+    parents = []
+    path = root
+    while True:
+        if os.path.isdir(os.path.join(path, ".git")) or os.path.isfile(os.path.join(path, ".git")):
+            break
+        parent = os.path.dirname(path)
+        if parent == path:
+            return IgnoreRules()
+        path = parent
+        parents.append(path)
+    rules = IgnoreRules()
+    for path in reversed(parents):
+        try:
+            with open(os.path.join(path, ".gitignore"), encoding="utf-8", errors="replace") as f:
+                rules = rules.extended("", f.read(), unanchored_only=True)
+        except OSError:
+            pass
+    return rules
+
+
+def _gitignore_mtime(path):
+    try:
+        return os.stat(os.path.join(path, ".gitignore")).st_mtime_ns
+    except OSError:
+        return None
+
+
+class PathIndex:
+    """Incrementally maintained index of the paths under root."""
+
+    def __init__(self, root=None, max_entries=250000, refresh_interval=2.0):
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self.root = None
+        self.truncated = False
+        self.build_seconds = 0.0
+        self._dirs = {}
+        self._root_rules = IgnoreRules()
+        self._added, self._removed = [], []
+        self._count = 0
+        self._snapshot = _Snapshot([])
+        self._last_query = None
+        self._generation = 0
+        self._last_refresh = 0.0
+        self._worker = None
+        self._lock = threading.Lock()
+        if root is not None:
+            self.set_root(root)
+
+    @property
+    def ready(self):
+        return self._last_refresh > 0
+
+    @property
+    def size(self):
+        return len(self._snapshot.paths)
+
+    def set_root(self, root):
+        """Point the index at root; the old index is dropped, the walk waits for the next query."""
+        root = os.path.abspath(root)
+        with self._lock:
+            if root == self.root:
+                return
+            self.root = root
+            self._generation += 1
+            self._dirs = {}
+            self._count = 0
+            self._snapshot = _Snapshot([])
+            self._last_query = None
+            self._last_refresh = 0.0
+            self.truncated = False
+
+    def ensure_fresh(self):
+        """Start a build or an incremental refresh in the background if one is due."""
+        with self._lock:
+            if self.root is None or (self._worker is not None and self._worker.is_alive()):
+                return
+            if self._last_refresh and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return
+            self._worker = threading.Thread(
+                target=self._update, args=(self._generation,), name="cliffy-path-index", daemon=True
+            )
+            self._worker.start()
+
+    def wait(self, timeout=None):
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def _update(self, generation):
+        start = time.perf_counter()
+        try:
+            self._added, self._removed = [], []
+            if self._dirs:
+                if self._refresh(generation) and generation == self._generation:
+                    self._apply_changes(generation)
+            else:
+                self._root_rules = _inherited_rules(self.root)
+                self._walk([""], generation)
+                if generation == self._generation:
+                    self._publish(generation)
+        except Exception:
+            pass  # A failed walk leaves the previous snapshot in place
+        with self._lock:
+            if generation == self._generation:
+                self._last_refresh = time.monotonic()
+                self.build_seconds = time.perf_counter() - start
+
+    def _scan(self, reldir, rules):
+        """Read one directory; returns its _Dir (rules already include its .gitignore)."""
+        path = os.path.join(self.root, reldir) if reldir else self.root
+        mtime = os.stat(path).st_mtime_ns
+        ignore_mtime = _gitignore_mtime(path)
+        if ignore_mtime is not None:
+            try:
+                with open(os.path.join(path, ".gitignore"), encoding="utf-8", errors="replace") as f:
+                    rules = rules.extended(reldir, f.read())
+            except OSError:
+                pass
+        files, subdirs = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                name = entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir and (name in ALWAYS_SKIP or name.startswith(".")):
+                    continue
+                if rules.rules and rules.ignored(_join(reldir, name), name, is_dir):
+                    continue
+                (subdirs if is_dir else files).append(name)
+        return _Dir(mtime, ignore_mtime, files, subdirs, rules)
+
+    def _walk(self, start_dirs, generation):
+        """Breadth-first walk from start_dirs until max_entries paths are indexed."""
+        queue = deque(start_dirs)
+        while queue:
+            if generation != self._generation:
+                return
+            if self._count >= self.max_entries:
+                self.truncated = True
+                return
+            reldir = queue.popleft()
+            parent = self._dirs.get(reldir.rpartition("/")[0]) if reldir else None
+            try:
+                node = self._scan(reldir, parent.rules if parent is not None else self._root_rules)
+            except OSError:
+                continue
+            self._dirs[reldir] = node
+            self._count += len(node.files) + len(node.subdirs)
+            self._added.extend(_entries(reldir, node))
+            queue.extend(_join(reldir, name) for name in node.subdirs)
+
+    def _drop(self, reldir):
+        """Forget reldir and everything indexed below it."""
+        node = self._dirs.pop(reldir, None)
+        if node is None:
+            return
+        self._count -= len(node.files) + len(node.subdirs)
+        self._removed.extend(_entries(reldir, node))
+        for name in node.subdirs:
+            self._drop(_join(reldir, name))
+
+    def _refresh(self, generation):
+        """Re-scan directories whose mtime (or .gitignore) changed; True if anything did."""
+        changed = False
+        # Parents first, so a subtree dropped with its parent is skipped below
+        for reldir in sorted(self._dirs, key=lambda d: d.count("/") + bool(d)):
+            if generation != self._generation:
+                return False
+            node = self._dirs.get(reldir)
+            if node is None:
+                continue
+            path = os.path.join(self.root, reldir) if reldir else self.root
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                self._drop(reldir)
+                changed = True
+                continue
+            # Creating or deleting a .gitignore bumps the directory mtime; only
+            # edits to an existing one need their own stat
+            if mtime == node.mtime and (node.ignore_mtime is None or _gitignore_mtime(path) == node.ignore_mtime):
+                continue
+            changed = True
+            parent = self._dirs.get(reldir.rpartition("/")[0]) if reldir else None
+            try:
+                fresh = self._scan(reldir, parent.rules if parent is not None else self._root_rules)
+            except OSError:
+                self._drop(reldir)
+                continue
+            if fresh.ignore_mtime != node.ignore_mtime:
+                # The rules changed for the whole subtree; walk it again
+                self._drop(reldir)
+                self._walk([reldir], generation)
+                continue
+            old_entries = set(_entries(reldir, node))
+            new_entries = _entries(reldir, fresh)
+            self._added.extend(path for path in new_entries if path not in old_entries)
+            self._removed.extend(old_entries.difference(new_entries))
+            old_subdirs = set(node.subdirs)
+            for name in old_subdirs.difference(fresh.subdirs):
+                self._drop(_join(reldir, name))
+            self._count += len(fresh.files) + len(fresh.subdirs) - len(node.files) - len(node.subdirs)
+            self._dirs[reldir] = fresh
+            self._walk([_join(reldir, name) for name in fresh.subdirs if name not in old_subdirs], generation)
+        return changed
+
+    def _apply_changes(self, generation):
+        """Patch the live snapshot with what the refresh added and removed."""
+        snapshot = self._snapshot
+        if (snapshot.dead + len(self._removed)) * 4 > len(snapshot.paths):
+            self._publish(generation)  # Mostly tombstones by now; start over compactly
+            return
+        with self._lock:
+            if generation == self._generation:
+                snapshot.update(self._added, self._removed)
+
+    def _publish(self, generation):
+        """Replace the snapshot with one built from scratch."""
+        paths = []
+        for reldir, node in list(self._dirs.items()):
+            paths.extend(_entries(reldir, node))
+        snapshot = _Snapshot(paths)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._snapshot = snapshot
+            self._last_query = None
+        # Warm the character masks most queries will need
+        for ch in PREWARM_CHARS:
+            if generation != self._generation:
+                return
+            snapshot.mask(ch)
+
+    def query(self, text, limit=50):
+        """Best fuzzy matches for text among the indexed paths (relative to root).
+
+        A path matches when it contains the characters of text in order;
+        case-insensitive unless text has uppercase letters. Matches in the
+        basename, shallower and shorter paths rank first. Starts a refresh
+        if one is due.
+        """
+        self.ensure_fresh()
+        snapshot = self._snapshot
+        version = snapshot.version
+        if not text or not snapshot.paths:
+            return []
+        case_sensitive = text != text.lower()
+        needle = text if case_sensitive else text.lower()
+        subjects = snapshot.paths if case_sensitive else snapshot.lower
+        names = snapshot.names if case_sensitive else snapshot.lower_names
+        search = re.compile("".join(
+            f"{re.escape(ch)}[^{re.escape(following)}]*" for ch, following in zip(needle, needle[1:])
+        ) + re.escape(needle[-1])).search
+
+        # Typing one more character only narrows the previous result
+        last = self._last_query
+        if not (last is not None and last[0] is snapshot and last[1] == version
+                and last[2] == case_sensitive and needle.startswith(last[3])):
+            last = None
+        candidates = None
+        if last is not None and last[4][1]:
+            ids = last[4][0]
+        else:
+            ids = candidates = snapshot.candidates(needle.lower())
+        # Basenames first: shorter strings, and the matches users usually want
+        name_matches = _matching(names, ids, search)
+        path_matches = None
+        if len(name_matches[0]) < limit:
+            if last is not None and last[5] is not None and last[5][1]:
+                ids = last[5][0]
+            elif candidates is None:
+                ids = snapshot.candidates(needle.lower())
+            else:
+                ids = candidates
+            path_matches = _matching(subjects, ids, search)
+        self._last_query = (snapshot, version, case_sensitive, needle, name_matches, path_matches)
+
+        matches = name_matches[0]
+        if len(matches) > SCORED_CANDIDATES:
+            # Too many to score in Python; keep the ones containing needle verbatim
+            contiguous = list(compress(matches, map(operator.contains, map(names.__getitem__, matches), repeat(needle))))
+            if len(contiguous) >= limit:
+                matches = contiguous
+            matches = matches[:SCORED_CANDIDATES]
+        elif path_matches is not None:
+            seen = set(matches)
+            matches = matches + [index for index in path_matches[0][:SCORED_CANDIDATES] if index not in seen]
+        ranked = heapq.nsmallest(limit, matches, key=lambda index: _score(subjects[index], names[index], needle))
+        return [snapshot.paths[index] for index in ranked]
+
+
+def _matching(subjects, ids, search):
+    """(indices among ids whose subject matches, whether the scan finished under the cap)"""
+    matches = list(islice(compress(ids, map(search, map(subjects.__getitem__, ids))), MAX_CANDIDATES))
+    return matches, len(matches) < MAX_CANDIDATES
+
+
+class _Snapshot:
+    """The indexed paths plus lazily built per-character bitsets.
+
+    Refreshes patch it in place: new paths are appended (extending every
+    built bitset) and removed ones become "" tombstones, which never match.
+    """
+
+    __slots__ = ("paths", "lower", "names", "lower_names", "positions", "masks", "dead", "version", "lock")
+
+    def __init__(self, paths):
+        self.paths, self.lower, self.names, self.lower_names = [], [], [], []
+        self.positions = {}
+        self.masks = {}
+        self.dead = 0
+        self.version = 0
+        self.lock = threading.Lock()
+        self._append(paths)
+
+    def _append(self, paths):
+        start = len(self.paths)
+        names = [path.rstrip("/").rpartition("/")[2] for path in paths]
+        self.positions.update(zip(paths, range(start, start + len(paths))))
+        self.paths.extend(paths)
+        self.lower.extend(path.lower() for path in paths)
+        self.names.extend(names)
+        self.lower_names.extend(name.lower() for name in names)
+
+    def update(self, added, removed):
+        with self.lock:
+            for path in removed:
+                index = self.positions.pop(path, None)
+                if index is not None:
+                    self.paths[index] = self.lower[index] = self.names[index] = self.lower_names[index] = ""
+                    self.dead += 1
+            start = len(self.paths)
+            self._append(added)
+            for ch, mask in self.masks.items():
+                self.masks[ch] = mask | (_bitset(ch, self.lower[start:]) << start)
+            self.version += 1
+
+    def mask(self, ch):
+        """Bitset (as an int) of the paths whose lowercase form contains ch."""
+        mask = self.masks.get(ch)
+        if mask is None:
+            with self.lock:
+                mask = self.masks[ch] = _bitset(ch, self.lower)
+        return mask
+
+    def candidates(self, needle):
+        """Indices of paths containing every character of needle (in any order).
+
+        When most paths qualify, the plain range is cheaper to scan than
+        decoding the bitset.
+        """
+        mask = -1
+        for ch in set(needle):
+            mask &= self.mask(ch)
+            if not mask:
+                return []
+        if mask.bit_count() * 4 > len(self.paths):
+            return range(len(self.paths))
+        bits = format(mask, "b")[::-1]
+        return [match.start() for match in re.finditer("1", bits)]
+
+
+def _bitset(ch, subjects):
+    return int("".join(["1" if ch in subject else "0" for subject in reversed(subjects)]) or "0", 2)
+
+
+def _score(subject, name, needle):
+    """Sort key: lower is better."""
+    if name.startswith(needle):
+        rank = 0
+    elif needle in name:
+        rank = 1
+    elif needle in subject:
+        rank = 2
+    elif _is_subsequence(needle, name):
+        rank = 3
+    else:
+        rank = 4
+    return (rank, subject.count("/"), len(subject), subject)
+
+
+def _is_subsequence(needle, haystack):
+    it = iter(haystack)
+    return all(ch in it for ch in needle)
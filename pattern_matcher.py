@@ -0,0 +1,98 @@
+"""
+Cliffy Pattern Matcher
+Aho-Corasick automata compiled once from security_config, so a command is
+scanned in a single pass and every destructive pattern / AI trigger it
+contains is reported with its span, severity and category.
+"""
+
+from collections import deque, namedtuple
+
+from security_config import DESTRUCTIVE_PATTERNS, AI_CHECK_TRIGGERS
+
+SEVERITY_RANK = {"critical": 4, "high": 3, "medium": 2, "low": 1}
+
+PatternMatch = namedtuple(
+    "PatternMatch", ["pattern", "start", "end", "severity", "category", "description"]
+)
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher (goto/fail/output automaton)."""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for index, pattern in enumerate(self.patterns):
+            self._add(pattern, index)
+        self._build_failure_links()
+
+    def _add(self, pattern, index):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._output[state].append(index)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._output[nxt].extend(self._output[self._fail[nxt]])
+
+    def finditer(self, text):
+        """Yield (pattern_index, start, end) for every occurrence, overlaps included."""
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in output[state]:
+                yield index, pos + 1 - len(self.patterns[index]), pos + 1
+
+
+_destructive = AhoCorasick(DESTRUCTIVE_PATTERNS.keys())
+_triggers = AhoCorasick(AI_CHECK_TRIGGERS.keys())
+
+
+def find_destructive_patterns(cmd):
+    """All DESTRUCTIVE_PATTERNS found in cmd, highest severity first.
+
+    Equal severities keep security_config order, so the first-listed
+    pattern still describes the command when several overlap.
+    """
+    matches = []
+    for index, start, end in _destructive.finditer(cmd):
+        pattern = _destructive.patterns[index]
+        info = DESTRUCTIVE_PATTERNS[pattern]
+        matches.append((
+            -SEVERITY_RANK.get(info["severity"], 0),
+            index,
+            start,
+            PatternMatch(pattern, start, end, info["severity"], info["category"], info["description"]),
+        ))
+    matches.sort(key=lambda m: m[:3])
+    return [m[3] for m in matches]
+
+
+def find_ai_triggers(cmd):
+    """AI_CHECK_TRIGGERS found in cmd (case-insensitive), in order of appearance."""
+    return [
+        (_triggers.patterns[index], start, end)
+        for index, start, end in _triggers.finditer(cmd.lower())
+    ]
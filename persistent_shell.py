@@ -0,0 +1,313 @@
+"""
+Cliffy Persistent Shell
+One long-lived bash process runs every command, so cd, export, alias,
+functions and sourced files persist exactly as in a normal shell, and no
+process startup or rc parsing is paid per command.
+
+bash keeps the terminal as stdin/stdout/stderr (interactive programs work
+unchanged). Commands arrive on a private control pipe as NUL-terminated
+(cwd, command) pairs and are eval'd in the shell itself. After each one
+bash writes the exit status, $PWD and the exported environment to a
+status pipe, terminated by a random per-session sentinel; Python applies
+the cwd and environment to its own process so the prompt, completions and
+AI context stay in sync.
+"""
+
+import contextlib
+import os
+import re
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+
+# Runs inside bash; @IN@/@OUT@ are replaced by the inherited pipe fds, $1 is the sentinel.
+# The environment is reported with the export builtin, which never forks.
+# Commands are eval'd inside a function. On SIGINT the handler arms a
+# DEBUG trap that (with extdebug) makes every function on the stack
+# return, so Ctrl-C abandons the whole command line, loops included, the
+# way an interactive shell does; the control loop itself is never in a
+# function and keeps running.
+_LOOP = r"""
+__cliffy_sentinel=$1
+shift
+shopt -s expand_aliases
+__cliffy_eval() { eval "$__cliffy_cmd"; }
+__cliffy_int() {
+    __cliffy_interrupted=1
+    shopt -s extdebug
+    trap '[[ ${#FUNCNAME[@]} -gt 0 ]] && return 2; :' DEBUG
+}
+trap __cliffy_int INT
+while IFS= read -r -d '' __cliffy_cwd <&@IN@ && IFS= read -r -d '' __cliffy_cmd <&@IN@; do
+    builtin cd -- "$__cliffy_cwd" 2>/dev/null
+    __cliffy_interrupted=
+    __cliffy_eval @IN@<&- @OUT@>&-
+    __cliffy_status=$?
+    if [[ -n $__cliffy_interrupted ]]; then
+        trap - DEBUG
+        shopt -u extdebug
+        __cliffy_status=130
+    fi
+    trap __cliffy_int INT
+    {
+        printf '%s\0%s\0' "$__cliffy_status" "$PWD"
+        export -p
+        printf '\0%s\0' "$__cliffy_sentinel"
+    } >&@OUT@
+done
+"""
+
+# Owned by the bash process itself, not worth mirroring into Python
+_UNSYNCED = {"_", "SHLVL"}
+
+
+class ShellExited(Exception):
+    """The coprocess went away (e.g. the command was `exit`)."""
+
+
+class PersistentShell:
+    """A bash coprocess that commands are sent to one at a time."""
+
+    def __init__(self, bash="bash", rcfile=None):
+        self.bash = bash
+        self.rcfile = rcfile
+        self._proc = None
+        self._control = None
+        self._status = None
+        self._sentinel = None
+        self._last_exports = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self):
+        """Spawn bash (a no-op if it is already running)."""
+        if self.running:
+            return
+        self._cleanup()
+        cmd_r, cmd_w = os.pipe()
+        status_r, status_w = os.pipe()
+        self._sentinel = "__cliffy_done_" + secrets.token_hex(8)
+        script = _LOOP.replace("@IN@", str(cmd_r)).replace("@OUT@", str(status_w))
+        if self.rcfile and os.path.isfile(self.rcfile):
+            script = f"source {_quote(self.rcfile)}\n" + script
+        try:
+            self._proc = subprocess.Popen(
+                [self.bash, "--noprofile", "--norc", "-c", script, "cliffy", self._sentinel],
+                pass_fds=(cmd_r, status_w),
+                close_fds=True,
+            )
+        finally:
+            os.close(cmd_r)
+            os.close(status_w)
+        self._control = os.fdopen(cmd_w, "wb", buffering=0)
+        self._status = status_r
+
+    def run(self, command):
+        """Run command in the shell; returns its exit status.
+
+        The shell's cwd and exported environment are applied to this
+        process afterwards. Raises ShellExited if bash exits during the
+        command; the next run() starts a fresh shell.
+        """
+        with self._lock:
+            # Spawned before SIGINT is ignored: bash cannot trap a signal ignored on entry
+            self.start()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            with _sigint_ignored():
+                status, cwd, exports = self._send(command)
+            # Re-parse the environment only when the export listing changed
+            env = None
+            if exports != self._last_exports:
+                env = parse_exports(exports)
+                self._last_exports = exports
+        _apply_state(cwd, env)
+        return int(status)
+
+    def _send(self, command):
+        try:
+            self._control.write(_encode(os.getcwd()) + b"\0" + _encode(command) + b"\0")
+        except (BrokenPipeError, OSError):
+            self._cleanup()
+            raise ShellExited("shell is not running")
+        return self._read_reply()
+
+    def _read_reply(self):
+        terminator = b"\0" + self._sentinel.encode() + b"\0"
+        buffer = b""
+        while not buffer.endswith(terminator):
+            chunk = os.read(self._status, 65536)
+            if not chunk:
+                self._cleanup()
+                raise ShellExited("shell exited")
+            buffer += chunk
+        status, cwd, exports = buffer[:-len(terminator)].split(b"\0", 2)
+        return _decode(status), _decode(cwd), _decode(exports)
+
+    def close(self, timeout=1.0):
+        """Ask bash to exit (EOF on the control pipe), killing it if it lingers."""
+        with self._lock:
+            if self._proc is not None and self._control is not None:
+                try:
+                    self._control.close()
+                    self._proc.wait(timeout)
+                except (OSError, subprocess.TimeoutExpired):
+                    self._proc.kill()
+            self._cleanup()
+
+    def _cleanup(self):
+        if self._control is not None:
+            try:
+                self._control.close()
+            except OSError:
+                pass
+        if self._status is not None:
+            try:
+                os.close(self._status)
+            except OSError:
+                pass
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.kill()
+        if self._proc is not None:
+            self._proc.wait()
+        self._proc = self._control = self._status = None
+
+
+@contextlib.contextmanager
+def _sigint_ignored():
+    """Ignore Ctrl-C here while bash runs a command, as bash does for its jobs.
+
+    bash abandons the command and reports 130; a KeyboardInterrupt raised
+    in this process could land just after os.read() returned and lose the
+    reply. Only the main thread can change signal handlers.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    previous = signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
+def _encode(text):
+    return text.encode("utf-8", "surrogateescape")
+
+
+def _decode(data):
+    return data.decode("utf-8", "surrogateescape")
+
+
+def _quote(text):
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
+_EXPORT_LINE = re.compile(r"declare -x ([A-Za-z_][A-Za-z0-9_]*)(=?)")
+_ANSI_ESCAPES = {
+    "a": "\a", "b": "\b", "e": "\x1b", "E": "\x1b", "f": "\f", "n": "\n",
+    "r": "\r", "t": "\t", "v": "\v", "\\": "\\", "'": "'", '"': '"', "?": "?",
+}
+
+
+def parse_exports(text):
+    """Parse `export -p` output into a dict (names exported without a value are skipped).
+
+    Values are either "double quoted" (with \\ \" \$ \` escapes) or
+    $'ANSI-C quoted' when they contain control characters.
+    """
+    env = {}
+    pos = 0
+    while True:
+        match = _EXPORT_LINE.search(text, pos)
+        if not match:
+            return env
+        name, has_value = match.groups()
+        pos = match.end()
+        if not has_value:
+            continue
+        if text.startswith('"', pos):
+            value, pos = _read_double_quoted(text, pos + 1)
+        elif text.startswith("$'", pos):
+            value, pos = _read_ansi_c(text, pos + 2)
+        else:
+            end = text.find("\n", pos)
+            end = len(text) if end == -1 else end
+            value, pos = text[pos:end], end
+        env[name] = value
+
+
+def _read_double_quoted(text, pos):
+    out = []
+    while pos < len(text):
+        ch = text[pos]
+        if ch == '"':
+            return "".join(out), pos + 1
+        if ch == "\\" and pos + 1 < len(text) and text[pos + 1] in '"\\$`':
+            out.append(text[pos + 1])
+            pos += 2
+            continue
+        out.append(ch)
+        pos += 1
+    return "".join(out), pos
+
+
+def _read_ansi_c(text, pos):
+    out = []
+    while pos < len(text):
+        ch = text[pos]
+        if ch == "'":
+            return "".join(out), pos + 1
+        if ch != "\\" or pos + 1 >= len(text):
+            out.append(ch)
+            pos += 1
+            continue
+        esc = text[pos + 1]
+        if esc in _ANSI_ESCAPES:
+            out.append(_ANSI_ESCAPES[esc])
+            pos += 2
+        elif esc in "01234567":
+            digits = re.match(r"[0-7]{1,3}", text[pos + 1:pos + 4]).group()
+            out.append(chr(int(digits, 8)))
+            pos += 1 + len(digits)
+        elif esc in "xuU":
+            width = {"x": 2, "u": 4, "U": 8}[esc]
+            digits = re.match(r"[0-9a-fA-F]{1,%d}" % width, text[pos + 2:pos + 2 + width])
+            if digits:
+                out.append(chr(int(digits.group(), 16)))
+                pos += 2 + len(digits.group())
+            else:
+                out.append(text[pos:pos + 2])
+                pos += 2
+        elif esc == "c" and pos + 2 < len(text):
+            out.append(chr(ord(text[pos + 2]) & 0x1f))
+            pos += 3
+        else:
+            out.append(text[pos:pos + 2])
+            pos += 2
+    return "".join(out), pos
+
+
+def _apply_state(cwd, env):
+    """Mirror the shell's cwd and (when given) exported environment into this process."""
+    if env is not None:
+        for name in list(os.environ):
+            if name not in env and name not in _UNSYNCED:
+                del os.environ[name]
+        for name, value in env.items():
+            if name not in _UNSYNCED and os.environ.get(name) != value:
+                os.environ[name] = value
+    try:
+        current = os.getcwd()
+    except OSError:
+        current = None  # Our directory was deleted by the command
+    if cwd and cwd != current:
+        try:
+            os.chdir(cwd)
+        except OSError:
+            pass
@@ -0,0 +1,456 @@
+"""
+Cliffy Shell Parser
+A small bash-compatible lexer and parser that turns a command line into
+pipelines, chain operators, redirections, sudo/env prefixes and argv per
+segment. Safety analysis, step splitting and execution all work from the
+same parse, which is memoized per command string.
+
+Understands single/double quotes, backslash escapes, $(...) and `...`
+substitutions, comments, fd-prefixed redirections (2>, &>, 2>&1) and the
+operators && || ; & | |&. It does not expand anything.
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+Word = namedtuple("Word", ["value", "raw", "start", "end", "quoted"])
+Redirect = namedtuple("Redirect", ["op", "fd", "target", "quoted"])
+Segment = namedtuple("Segment", [
+    "raw", "start", "end", "words", "argv", "assignments", "prefixes",
+    "sudo", "command", "args", "redirects",
+])
+
+PIPE_OPERATORS = ("|", "|&")
+STEP_SEPARATORS = ("&&", ";", "\n")
+_OPERATORS = ("&&", "||", "|&", ";", "|", "&", "\n")
+_REDIRECTS = ("&>>", "&>", "<<<", "<<-", "<<", "<&", "<>", "<", ">>", ">|", ">&", ">")
+OVERWRITE_REDIRECTS = (">", ">|", "&>")
+
+# Wrappers that run the rest of the segment as the real command
+PREFIX_COMMANDS = {"sudo", "doas", "env", "nohup", "time", "command", "exec", "nice"}
+_PREFIX_OPTIONS_WITH_VALUE = {
+    "sudo": {"-u", "-g", "-U", "-C", "-D", "-h", "-p", "-r", "-t", "-T"},
+    "doas": {"-u", "-C"},
+    "env": {"-u", "-C", "-S"},
+    "nice": {"-n"},
+}
+
+# Commands whose quoted arguments are data (messages, patterns, text), so a
+# dangerous-looking string inside quotes is not something that will run.
+# None means every quoted argument is data; otherwise only the values of
+# the listed options are (git's -c, aliases and --exec run commands).
+DATA_ARGUMENT_COMMANDS = {
+    "echo": None, "printf": None, "grep": None, "egrep": None, "fgrep": None,
+    "rg": None, "ag": None, "jq": None, "cat": None, "head": None, "tail": None,
+    "ls": None, "wc": None, "touch": None, "mkdir": None, "which": None,
+    "type": None, "notify-send": None,
+    "git": {"-m", "--message", "--grep", "--author"},
+}
+# Options whose value is a command to run, never data
+COMMAND_OPTIONS = {"--pre"}
+# Pagers only display what is piped into them (their own arguments can run
+# commands: less "+!cmd"), so data may still be blanked upstream of them
+PAGERS = {"less", "more"}
+
+_ASSIGNMENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*=")
+
+
+class ParsedCommand:
+    """Immutable parse of one command line (see parse_command())."""
+
+    def __init__(self, raw, pipelines, operators, unterminated, comments=()):
+        self.raw = raw
+        self.pipelines = pipelines      # tuple of tuples of Segment
+        self.operators = operators      # operator after each pipeline (a trailing & included)
+        self.unterminated = unterminated
+        self.comments = comments        # (start, end) spans of # comments
+        self.segments = tuple(seg for pipeline in pipelines for seg in pipeline)
+
+    @property
+    def has_chaining(self):
+        return any(op in ("&&", "||", ";", "\n") for op in self.operators)
+
+    @property
+    def has_pipe(self):
+        return any(len(pipeline) > 1 for pipeline in self.pipelines)
+
+    @property
+    def is_simple(self):
+        """A single command: no pipes, chaining or background jobs."""
+        return len(self.segments) == 1 and not self.operators
+
+    @property
+    def uses_sudo(self):
+        return any(seg.sudo for seg in self.segments)
+
+    @property
+    def redirects(self):
+        return tuple(r for seg in self.segments for r in seg.redirects)
+
+    def segments_for(self, command):
+        return tuple(seg for seg in self.segments if seg.command == command)
+
+    def steps(self):
+        """Raw text of each step, split on top-level && ; and newlines."""
+        steps = []
+        group_start = None
+        group_end = None
+        for index, pipeline in enumerate(self.pipelines):
+            if group_start is None:
+                group_start = pipeline[0].start
+            group_end = pipeline[-1].end
+            op = self.operators[index] if index < len(self.operators) else None
+            if op in STEP_SEPARATORS:
+                steps.append(self.raw[group_start:group_end].strip())
+                group_start = None
+        if group_start is not None:
+            end = len(self.raw) if self.operators[-1:] == ("&",) else group_end
+            steps.append(self.raw[group_start:end].strip())
+        return [step for step in steps if step]
+
+    def analysis_text(self):
+        """The command with comments and quoted data arguments blanked out.
+
+        Quoted data arguments of DATA_ARGUMENT_COMMANDS (commit messages,
+        grep patterns, echo text) become '' so pattern matching does not
+        flag them; everything else, including bash -c / eval strings, is kept.
+        Arguments with $(...) or `...` are never blanked, and neither is
+        anything piped on into a command outside the data set (echo ... | sh).
+        """
+        spans = list(self.comments)
+        for pipeline in self.pipelines:
+            for index, seg in enumerate(pipeline):
+                if seg.command not in DATA_ARGUMENT_COMMANDS:
+                    continue
+                if any(later.command not in DATA_ARGUMENT_COMMANDS and later.command not in PAGERS
+                       for later in pipeline[index + 1:]):
+                    continue
+                data_options = DATA_ARGUMENT_COMMANDS[seg.command]
+                command_seen = False
+                previous = None
+                for word in seg.words:
+                    if not command_seen:
+                        command_seen = word.value == seg.command and not word.quoted
+                        continue
+                    if (word.quoted and "$(" not in word.raw and "`" not in word.raw
+                            and previous not in COMMAND_OPTIONS
+                            and (data_options is None or _is_option_value(word.value, previous, data_options))):
+                        spans.append((word.start, word.end))
+                    previous = word.value
+        text = self.raw
+        for start, end in sorted(spans, reverse=True):
+            text = text[:start] + ("''" if (start, end) not in self.comments else "") + text[end:]
+        return text
+
+
+def _is_option_value(value, previous, options):
+    """True if value is the argument of one of options (-m "x", -m"x" or --message="x")."""
+    if previous in options:
+        return True
+    for option in options:
+        if option.startswith("--") and value.startswith(option + "="):
+            return True
+        if not option.startswith("--") and value.startswith(option) and len(value) > len(option):
+            return True
+    return False
+
+
+@lru_cache(maxsize=512)
+def parse_command(cmd):
+    """Parse a command line; results are cached per string."""
+    tokens, unterminated, comments = _lex(cmd)
+
+    pipelines = []
+    operators = []
+    pipeline = []
+    pending = []    # tokens of the current segment
+
+    def close_segment():
+        if pending:
+            pipeline.append(_build_segment(cmd, pending))
+            pending.clear()
+
+    for token in tokens:
+        if token[0] == "op":
+            op = token[1]
+            close_segment()
+            if op in PIPE_OPERATORS:
+                continue
+            if pipeline:
+                pipelines.append(tuple(pipeline))
+                operators.append(op)
+                pipeline = []
+        else:
+            pending.append(token)
+    close_segment()
+    if pipeline:
+        pipelines.append(tuple(pipeline))
+    # A trailing ; or newline is a no-op; a trailing & is kept (background job)
+    while len(operators) >= len(pipelines) and operators and operators[-1] in (";", "\n"):
+        operators.pop()
+    return ParsedCommand(cmd, tuple(pipelines), tuple(operators), unterminated, tuple(comments))
+
+
+def split_steps(cmd):
+    return parse_command(cmd).steps()
+
+
+# ----------------------------------------------------------------------
+# lexer
+# ----------------------------------------------------------------------
+
+def _lex(cmd):
+    """Return (tokens, unterminated, comment spans).
+
+    Tokens are ("word", Word), ("op", op, start, end) or
+    ("redir", op, fd, start, end).
+    """
+    tokens = []
+    comments = []
+    i = 0
+    n = len(cmd)
+    value = []
+    start = None
+    quoted = False
+    unterminated = False
+
+    def flush(end):
+        nonlocal start, quoted
+        if start is not None:
+            tokens.append(("word", Word("".join(value), cmd[start:end], start, end, quoted)))
+        value.clear()
+        start = None
+        quoted = False
+
+    while i < n:
+        ch = cmd[i]
+
+        if ch in " \t\r":
+            flush(i)
+            i += 1
+            continue
+
+        if ch == "#" and start is None:
+            # Comment to end of line
+            newline = cmd.find("\n", i)
+            end = n if newline == -1 else newline
+            comments.append((i, end))
+            i = end
+            continue
+
+        op = _match(cmd, i, _REDIRECTS)
+        if op:
+            fd = None
+            if start is not None and not quoted and value and "".join(value).isdigit() and op != "&>" and op != "&>>":
+                fd = "".join(value)
+                value.clear()
+                start = None
+            else:
+                flush(i)
+            tokens.append(("redir", op, fd, i, i + len(op)))
+            i += len(op)
+            continue
+
+        op = _match(cmd, i, _OPERATORS)
+        if op:
+            flush(i)
+            tokens.append(("op", op, i, i + len(op)))
+            i += len(op)
+            continue
+
+        if start is None:
+            start = i
+
+        if ch == "\\":
+            if i + 1 < n and cmd[i + 1] == "\n":
+                i += 2  # line continuation
+                continue
+            if i + 1 < n:
+                value.append(cmd[i + 1])
+            quoted = True
+            i += 2
+            continue
+
+        if ch == "'":
+            end = cmd.find("'", i + 1)
+            if end == -1:
+                unterminated = True
+                end = n
+            value.append(cmd[i + 1:end])
+            quoted = True
+            i = end + 1
+            continue
+
+        if ch == '"':
+            i, text, closed = _read_double_quoted(cmd, i + 1)
+            value.append(text)
+            quoted = True
+            unterminated = unterminated or not closed
+            continue
+
+        if ch == "$" and cmd.startswith("$(", i):
+            end, closed = _skip_substitution(cmd, i + 2)
+            value.append(cmd[i:end])
+            unterminated = unterminated or not closed
+            i = end
+            continue
+
+        if ch == "`":
+            end = cmd.find("`", i + 1)
+            if end == -1:
+                unterminated = True
+                end = n - 1
+            value.append(cmd[i:end + 1])
+            i = end + 1
+            continue
+
+        value.append(ch)
+        i += 1
+
+    flush(n)
+    return tokens, unterminated, comments
+
+
+def _match(cmd, i, candidates):
+    for candidate in candidates:
+        if cmd.startswith(candidate, i):
+            return candidate
+    return None
+
+
+def _read_double_quoted(cmd, i):
+    """Read up to the closing quote; returns (next index, unescaped text, closed)."""
+    out = []
+    n = len(cmd)
+    while i < n:
+        ch = cmd[i]
+        if ch == '"':
+            return i + 1, "".join(out), True
+        if ch == "\\" and i + 1 < n and cmd[i + 1] in '"\\$`\n':
+            out.append(cmd[i + 1])
+            i += 2
+            continue
+        if ch == "$" and cmd.startswith("$(", i):
+            end, _ = _skip_substitution(cmd, i + 2)
+            out.append(cmd[i:end])
+            i = end
+            continue
+        out.append(ch)
+        i += 1
+    return n, "".join(out), False
+
+
+def _skip_substitution(cmd, i):
+    """Index just past the ')' closing a $( ... ), honouring nesting and quotes."""
+    depth = 1
+    n = len(cmd)
+    while i < n:
+        ch = cmd[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "'":
+            end = cmd.find("'", i + 1)
+            i = n if end == -1 else end + 1
+            continue
+        if ch == '"':
+            i, _, _ = _read_double_quoted(cmd, i + 1)
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1, True
+        i += 1
+    return n, False
+
+
+# ----------------------------------------------------------------------
+# segments
+# ----------------------------------------------------------------------
+
+def _build_segment(cmd, tokens):
+    words = []
+    redirects = []
+    start = None
+    end = None
+    expecting_target = None
+
+    for token in tokens:
+        if token[0] == "redir":
+            _, op, fd, tok_start, tok_end = token
+            expecting_target = (op, fd)
+            start = tok_start if start is None else start
+            end = tok_end
+            continue
+        word = token[1]
+        start = word.start if start is None else start
+        end = word.end
+        if expecting_target:
+            op, fd = expecting_target
+            redirects.append(Redirect(op, fd, word.value, word.quoted))
+            expecting_target = None
+        else:
+            words.append(word)
+    if expecting_target:
+        redirects.append(Redirect(expecting_target[0], expecting_target[1], "", False))
+
+    argv = tuple(w.value for w in words)
+    index = 0
+    assignments = []
+    while index < len(words) and _ASSIGNMENT.match(words[index].raw):
+        name, _, val = argv[index].partition("=")
+        assignments.append((name, val))
+        index += 1
+
+    prefixes = []
+    while index < len(argv) and argv[index] in PREFIX_COMMANDS:
+        prefix = argv[index]
+        prefixes.append(prefix)
+        index += 1
+        takes_value = _PREFIX_OPTIONS_WITH_VALUE.get(prefix, set())
+        while index < len(argv):
+            arg = argv[index]
+            if arg == "--":
+                index += 1
+                break
+            if prefix == "env" and _ASSIGNMENT.match(arg):
+                assignments.append(tuple(arg.split("=", 1)))
+                index += 1
+                continue
+            if arg.startswith("-") and len(arg) > 1:
+                index += 2 if arg in takes_value else 1
+                continue
+            break
+
+    command = argv[index] if index < len(argv) else ""
+    args = argv[index + 1:] if index < len(argv) else ()
+    return Segment(
+        raw=cmd[start:end] if start is not None else "",
+        start=start or 0,
+        end=end or 0,
+        words=tuple(words),
+        argv=argv,
+        assignments=tuple(assignments),
+        prefixes=tuple(prefixes),
+        sudo="sudo" in prefixes or "doas" in prefixes,
+        command=command,
+        args=tuple(args),
+        redirects=tuple(redirects),
+    )
+
+
+def positional_args(args):
+    """Non-option arguments (everything after a bare -- counts as positional)."""
+    result = []
+    options_done = False
+    for arg in args:
+        if not options_done and arg == "--":
+            options_done = True
+            continue
+        if not options_done and arg.startswith("-") and arg != "-":
+            continue
+        result.append(arg)
+    return result
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Cliffy Stub API Server
+Local OpenAI-compatible /chat/completions endpoint (streaming and not), so
+the shell, the benchmarks and failure drills run without an API key or
+network:
+
+    python3 stub_server.py --port 8089 --latency lognormal:150,0.5 --rate-limit 0.05
+    GROQ_API_ENDPOINT=http://127.0.0.1:8089 GROQ_API_KEY=stub ./cliffy
+
+Answers come from scripted rules (--rules FILE, a JSON list of
+{"match": regex, "response": text} checked against the last user
+message) and otherwise from built-in rules that recognise the shell's own
+prompts: completions, safety verdicts, explanations, %%% planning and code.
+
+Latency is drawn per request from a distribution (fixed, uniform, normal
+or lognormal) before the first byte; streamed answers add --token-ms per
+chunk. Faults are injected per request with the given probabilities: 429
+with Retry-After, bursts of consecutive 5xx, bodies cut off mid-way, and
+stalls that hold the connection open without sending anything. GET
+/stats returns the request, status and fault counters as JSON.
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+KNOWN_COMMANDS = [
+    "git status", "git log --oneline -10", "git diff --stat", "git pull --rebase",
+    "git push origin HEAD", "git checkout -b feature", "docker ps -a", "docker compose up -d",
+    "docker images", "ls -la", "grep -rn TODO .", "find . -name '*.py'", "du -sh * | sort -h",
+    "df -h", "tar -czf archive.tar.gz .", "kubectl get pods", "python3 -m http.server 8000",
+    "pip install -r requirements.txt", "npm install", "npm run build", "systemctl status nginx",
+    "ssh user@example.com", "curl -s https://example.com", "cat /etc/os-release", "top -o %CPU",
+]
+DANGEROUS = re.compile(r"\b(rm|dd|mkfs\S*|shred|truncate|chmod -R|chown -R)\b|>\s*/dev/sd")
+
+
+def parse_latency(spec):
+    """Turn "fixed:MS", "uniform:LO,HI", "normal:MEAN,SD" or "lognormal:MEDIAN,SIGMA"
+    into a function of an rng returning seconds."""
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"bad latency spec: {spec}")
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(*values) / 1000
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(*values)) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(max(values[0], 0.001))
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"bad latency spec: {spec}")
+
+
+def default_response(prompt):
+    """(kind, text) for one of the shell's prompts."""
+    match = re.search(r"respond with only the completed command, no explanations\): (.*)", prompt, re.S)
+    if match:
+        typed = match.group(1)
+        return "autosuggest", next((c for c in KNOWN_COMMANDS if c.startswith(typed)), typed)
+    match = re.search(r"destructiveness.*\nCommand: (.*)", prompt, re.S)
+    if match:
+        if DANGEROUS.search(match.group(1)):
+            return "safety", "DANGEROUS: it deletes or overwrites data"
+        return "safety", "SAFE"
+    if "Explain what each of these commands" in prompt:
+        steps = re.findall(r"^\d+\. (.*)$", prompt, re.M)
+        return "explain", json.dumps([f"Runs {step}." for step in steps])
+    match = re.search(r"Explain what this command does.*\nCommand: (.*)", prompt, re.S)
+    if match:
+        return "explain", f"Runs {match.group(1).strip()}."
+    if "Say 'Connected'" in prompt:
+        return "connection_test", "Connected"
+    if "Parse the task into JSON" in prompt:
+        return "codegen", '{"needs_dir": false, "dir_name": ""}'
+    if "List the files needed" in prompt:
+        return "codegen", "main.py"
+    if "filename" in prompt.lower() and prompt.startswith("Suggest"):
+        return "codegen", "main.py"
+    if "code" in prompt.lower() and prompt.startswith("Write"):
+        return "codegen", "print('hello from the stub server')"
+    match = re.search(r"(?:shell command to|terminal command to):? (.*?)(?:\.\n|\. For |\. Respond|$)", prompt, re.S)
+    if match:
+        task = match.group(1).strip().replace("'", "")
+        return "command", f"echo 'stub: {task}'"
+    return "chat", "OK"
+
+
+class StubServer:
+    """Threaded HTTP server answering /chat/completions with injected latency and faults."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency="fixed:0", token_ms=10.0,
+                 rate_limit=0.0, retry_after=1, error_rate=0.0, error_burst=3,
+                 truncate=0.0, stall=0.0, stall_seconds=30.0, rules=(), responder=None,
+                 model="stub-model", seed=None):
+        self.host = host
+        self.port = port
+        self.latency = parse_latency(latency) if isinstance(latency, str) else latency
+        self.token_ms = token_ms
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.error_burst = max(1, error_burst)
+        self.truncate = truncate
+        self.stall = stall
+        self.stall_seconds = stall_seconds
+        self.rules = [(re.compile(rule["match"], re.S), rule["response"]) for rule in rules]
+        self.responder = responder
+        self.model = model
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "streamed": 0, "cancelled": 0, "by_kind": {}, "by_status": {}, "faults": {}}
+        self._burst_left = 0
+        self._httpd = None
+        self._stopping = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self._httpd.server_address[1]}"
+
+    def _bind(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._httpd.daemon_threads = True
+
+    def start(self):
+        """Serve on a background thread; returns the base URL for GROQ_API_ENDPOINT."""
+        self._bind()
+        threading.Thread(target=self._httpd.serve_forever, name="cliffy-stub-server", daemon=True).start()
+        return self.url
+
+    def serve_forever(self):
+        self._bind()
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._stopping.set()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def stats(self):
+        with self.lock:
+            return json.loads(json.dumps(self.counters))
+
+    def count(self, key, name=None):
+        with self.lock:
+            if name is None:
+                self.counters[key] += 1
+            else:
+                self.counters[key][name] = self.counters[key].get(name, 0) + 1
+
+    def choose_fault(self):
+        """None, or the fault to inject into this request."""
+        with self.lock:
+            if self._burst_left:
+                self._burst_left -= 1
+                return "server_error"
+            if self.rng.random() < self.error_rate:
+                self._burst_left = self.error_burst - 1
+                return "server_error"
+            if self.rng.random() < self.rate_limit:
+                return "rate_limit"
+            if self.rng.random() < self.stall:
+                return "stall"
+            if self.rng.random() < self.truncate:
+                return "truncate"
+        return None
+
+    def sample_latency(self):
+        with self.lock:
+            return self.latency(self.rng)
+
+    def respond(self, prompt):
+        """(kind, text): scripted rules, then the responder hook, then the built-in rules."""
+        for pattern, response in self.rules:
+            if pattern.search(prompt):
+                return "scripted", response
+        if self.responder is not None:
+            text = self.responder(prompt)
+            if text is not None:
+                return "custom", text
+        return default_response(prompt)
+
+    def wait(self, seconds):
+        """Sleep unless the server is shutting down; False if it is."""
+        return not self._stopping.wait(seconds)
+
+
+def _make_handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes; with Nagle on, the
+            # second waits for the client's delayed ACK on keep-alive connections
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self.send_json(200, stub.stats())
+            elif self.path.rstrip("/").endswith("/models"):
+                self.send_json(200, {"object": "list", "data": [{"id": stub.model, "object": "model"}]})
+            else:
+                self.send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_json(404, {"error": {"message": "not found"}})
+                return
+            try:
+                request = json.loads(body or b"{}")
+                prompt = request["messages"][-1]["content"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                self.send_json(400, {"error": {"message": "expected a chat completion request"}})
+                return
+            stub.count("requests")
+            kind, content = stub.respond(prompt)
+            stub.count("by_kind", kind)
+            fault = stub.choose_fault()
+            if fault:
+                stub.count("faults", fault)
+            try:
+                if not stub.wait(stub.sample_latency()):
+                    return
+                if fault == "rate_limit":
+                    self.send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                                   {"Retry-After": str(stub.retry_after)})
+                elif fault == "server_error":
+                    with stub.lock:
+                        status = stub.rng.choice((500, 502, 503))
+                    self.send_json(status, {"error": {"message": "upstream failure"}})
+                elif fault == "stall" and not request.get("stream"):
+                    stub.wait(stub.stall_seconds)  # Never answer; the client has to time out
+                    self.close_connection = True
+                elif request.get("stream"):
+                    stub.count("streamed")
+                    self.stream(content, fault)
+                else:
+                    self.complete(content, truncate=fault == "truncate")
+            except (BrokenPipeError, ConnectionResetError):
+                stub.count("cancelled")  # The client went away (e.g. a superseded suggestion)
+                self.close_connection = True
+
+        def send_json(self, status, payload, headers=None):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            stub.count("by_status", str(status))
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def complete(self, content, truncate=False):
+            data = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": stub.model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+            }).encode()
+            self.send_response(200)
+            stub.count("by_status", "200")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if truncate:
+                self.wfile.write(data[:len(data) // 2])
+                self.drop()
+                return
+            self.wfile.write(data)
+
+        def stream(self, content, fault):
+            self.send_response(200)
+            stub.count("by_status", "200")
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            pieces = [content[i:i + 4] for i in range(0, len(content), 4)] or [""]
+            for index, piece in enumerate(pieces):
+                event = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "model": stub.model,
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                self.chunk(f"data: {json.dumps(event)}\n\n".encode())
+                if index == 0 and fault == "stall":
+                    stub.wait(stub.stall_seconds)  # First token, then silence
+                    self.close_connection = True
+                    return
+                if index == len(pieces) // 2 and fault == "truncate":
+                    self.drop()
+                    return
+                if not stub.wait(stub.token_ms / 1000):
+                    return
+            self.chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def chunk(self, data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def drop(self):
+            """Close the socket mid-body."""
+            self.wfile.flush()
+            self.close_connection = True
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub for Cliffy (point GROQ_API_ENDPOINT at it)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="time to first byte: fixed:MS, uniform:LO,HI, normal:MEAN,SD or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--token-ms", type=float, default=10.0, help="delay between streamed chunks")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="probability of a 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of starting a 5xx burst")
+    parser.add_argument("--error-burst", type=int, default=3, help="consecutive 5xx responses per burst")
+    parser.add_argument("--truncate", type=float, default=0.0, help="probability of cutting the body off half-way")
+    parser.add_argument("--stall", type=float, default=0.0, help="probability of stalling the response")
+    parser.add_argument("--stall-seconds", type=float, default=30.0, help="how long a stall holds the connection")
+    parser.add_argument("--rules", help='JSON file: [{"match": "regex", "response": "text"}, ...]')
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    rules = []
+    if args.rules:
+        with open(args.rules) as f:
+            rules = json.load(f)
+    stub = StubServer(
+        host=args.host, port=args.port, latency=args.latency, token_ms=args.token_ms,
+        rate_limit=args.rate_limit, retry_after=args.retry_after, error_rate=args.error_rate,
+        error_burst=args.error_burst, truncate=args.truncate, stall=args.stall,
+        stall_seconds=args.stall_seconds, rules=rules, seed=args.seed,
+    )
+    print(f"Stub API on http://{args.host}:{args.port} - run the shell with "
+          f"GROQ_API_ENDPOINT=http://{args.host}:{args.port} GROQ_API_KEY=stub")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Cliffy Suggestion Cache
+Maps typed prefixes to AI suggestions, with a trie over the suggestion text
+so "longest cached key whose suggestion still extends the typed text" is
+answered in time proportional to the typed text, not the cache size.
+
+The cache is bounded by entry count and approximate byte size, evicting
+with a pluggable policy:
+  lru      least recently used
+  lfu      least frequently used (ties broken by recency)
+  tinylfu  LRU eviction plus TinyLFU-style admission: a new key only
+           displaces the LRU victim if it has been requested more often
+"""
+
+from collections import OrderedDict
+
+POLICIES = ("lru", "lfu", "tinylfu")
+
+# Rough per-entry cost of the dict, order and trie bookkeeping, in bytes
+ENTRY_OVERHEAD = 200
+
+
+def entry_size(key, suggestion):
+    """Approximate memory footprint of one cache entry."""
+    return len(key) + len(suggestion) + ENTRY_OVERHEAD
+
+
+class _LRUPolicy:
+    def __init__(self):
+        self._recency = OrderedDict()
+
+    def on_insert(self, key):
+        self._recency[key] = None
+
+    def on_access(self, key):
+        self._recency.move_to_end(key)
+
+    def on_remove(self, key):
+        del self._recency[key]
+
+    def victim(self):
+        return next(iter(self._recency))
+
+    def record(self, key):
+        pass
+
+    def admit(self, candidate, victim):
+        return True
+
+
+class _LFUPolicy:
+    def __init__(self):
+        self._freq = {}
+        self._buckets = {}  # frequency -> keys in recency order
+        self._min_freq = 0
+
+    def _bucket_add(self, key, freq):
+        self._freq[key] = freq
+        self._buckets.setdefault(freq, OrderedDict())[key] = None
+
+    def _bucket_remove(self, key):
+        freq = self._freq.pop(key)
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+        return freq
+
+    def on_insert(self, key):
+        self._bucket_add(key, 1)
+        self._min_freq = 1
+
+    def on_access(self, key):
+        self._bucket_add(key, self._bucket_remove(key) + 1)
+
+    def on_remove(self, key):
+        self._bucket_remove(key)
+
+    def victim(self):
+        if self._min_freq not in self._buckets:
+            self._min_freq = min(self._buckets)
+        return next(iter(self._buckets[self._min_freq]))
+
+    def record(self, key):
+        pass
+
+    def admit(self, candidate, victim):
+        return True
+
+
+class _TinyLFUPolicy(_LRUPolicy):
+    """LRU eviction guarded by a frequency-based admission filter.
+
+    Frequencies are counted for every requested key, cached or not, and
+    halved once sample_size requests have been seen so old popularity fades.
+    """
+
+    def __init__(self, sample_size):
+        super().__init__()
+        self._counts = {}
+        self._samples = 0
+        self._sample_size = max(sample_size, 100)
+
+    def record(self, key):
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._samples += 1
+        if self._samples >= self._sample_size:
+            self._counts = {k: c // 2 for k, c in self._counts.items() if c > 1}
+            self._samples //= 2
+
+    def admit(self, candidate, victim):
+        return self._counts.get(candidate, 0) > self._counts.get(victim, 0)
+
+
+def make_policy(name, max_entries):
+    if name == "lru":
+        return _LRUPolicy()
+    if name == "lfu":
+        return _LFUPolicy()
+    if name == "tinylfu":
+        return _TinyLFUPolicy(sample_size=10 * max_entries)
+    raise ValueError(f"Unknown cache policy: {name} (expected one of {', '.join(POLICIES)})")
+
+
+class _TrieNode:
+    __slots__ = ("children", "keys", "best")
+
+    def __init__(self):
+        self.children = {}
+        self.keys = set()   # cache keys whose suggestion ends exactly here
+        self.best = None    # longest key anywhere in this subtree
+
+
+class SuggestionCache:
+    """Bounded, dict-like prefix -> suggestion cache with a suggestion-text trie.
+
+    Not thread-safe on its own; callers hold cache_lock as before.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=None, policy="lru"):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy_name = policy
+        self._policy = make_policy(policy, max_entries)
+        self._entries = {}
+        self._order = {}    # key -> insertion sequence, for dict-order tie-breaks
+        self._next_order = 0
+        self._bytes = 0
+        self._root = _TrieNode()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+
+    # ------------------------------------------------------------------
+    # dict interface
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __getitem__(self, key):
+        return self._entries[key]
+
+    def __setitem__(self, key, suggestion):
+        if key in self._entries:
+            old = self._entries[key]
+            self._unindex(key, old)
+            self._bytes += entry_size(key, suggestion) - entry_size(key, old)
+            self._entries[key] = suggestion
+            self._index(key, suggestion)
+            self._policy.on_access(key)
+        else:
+            if not self._make_room_for(key, entry_size(key, suggestion)):
+                self.rejections += 1
+                return
+            self._order[key] = self._next_order
+            self._next_order += 1
+            self._bytes += entry_size(key, suggestion)
+            self._entries[key] = suggestion
+            self._index(key, suggestion)
+            self._policy.on_insert(key)
+        self._enforce_limits(keep=key)
+
+    def __delitem__(self, key):
+        suggestion = self._entries[key]
+        self._unindex(key, suggestion)
+        del self._entries[key]
+        del self._order[key]
+        self._bytes -= entry_size(key, suggestion)
+        self._policy.on_remove(key)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def get(self, key, default=None):
+        return self._entries.get(key, default)
+
+    def keys(self):
+        return self._entries.keys()
+
+    def items(self):
+        return self._entries.items()
+
+    def clear(self):
+        self._entries.clear()
+        self._order.clear()
+        self._bytes = 0
+        self._policy = make_policy(self.policy_name, self.max_entries)
+        self._root = _TrieNode()
+
+    # ------------------------------------------------------------------
+    # limits and statistics
+    # ------------------------------------------------------------------
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def _over_limit(self, extra_entries=0, extra_bytes=0):
+        if self.max_entries is not None and len(self._entries) + extra_entries > self.max_entries:
+            return True
+        if self.max_bytes is not None and self._bytes + extra_bytes > self.max_bytes:
+            return True
+        return False
+
+    def _make_room_for(self, key, size):
+        """Evict until a new entry fits; False if the admission policy refuses it."""
+        while self._entries and self._over_limit(1, size):
+            victim = self._policy.victim()
+            if not self._policy.admit(key, victim):
+                return False
+            del self[victim]
+            self.evictions += 1
+        return True
+
+    def _enforce_limits(self, keep=None):
+        while self._entries and self._over_limit():
+            victim = self._policy.victim()
+            if victim == keep and len(self._entries) == 1:
+                break
+            del self[victim]
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "policy": self.policy_name,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "rejections": self.rejections,
+        }
+
+    # ------------------------------------------------------------------
+    # prefix lookup
+    # ------------------------------------------------------------------
+
+    def lookup(self, text):
+        """Return the suggestion for text: exact key first, else the
+        suggestion of the longest key whose suggestion starts with text.
+
+        Updates hit/miss counters and the eviction policy's bookkeeping.
+        """
+        self._policy.record(text)
+        key = self._find(text)
+        if key is None or not self._entries[key]:
+            self.misses += 1
+            return ""
+        self.hits += 1
+        self._policy.on_access(key)
+        return self._entries[key]
+
+    def _find(self, text):
+        if text in self._entries:
+            return text
+        node = self._root
+        for ch in text:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node.best
+
+    # ------------------------------------------------------------------
+    # trie maintenance
+    # ------------------------------------------------------------------
+
+    def _longer(self, a, b):
+        """Longer of two keys; on a tie the earlier-inserted one wins."""
+        if a is None:
+            return b
+        if b is None:
+            return a
+        if len(b) != len(a):
+            return b if len(b) > len(a) else a
+        return b if self._order[b] < self._order[a] else a
+
+    def _index(self, key, suggestion):
+        if not suggestion:
+            return
+        node = self._root
+        node.best = self._longer(node.best, key)
+        for ch in suggestion:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _TrieNode()
+            node = child
+            node.best = self._longer(node.best, key)
+        node.keys.add(key)
+
+    def _unindex(self, key, suggestion):
+        if not suggestion:
+            return
+        path = [self._root]
+        node = self._root
+        for ch in suggestion:
+            node = node.children.get(ch)
+            if node is None:
+                return
+            path.append(node)
+        node.keys.discard(key)
+
+        # Recompute "best" bottom-up, pruning branches that became empty
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            best = None
+            for k in node.keys:
+                best = self._longer(best, k)
+            for child in node.children.values():
+                best = self._longer(best, child.best)
+            node.best = best
+            if depth and best is None:
+                del path[depth - 1].children[suggestion[depth - 1]]
@@ -0,0 +1,181 @@
+"""
+Cliffy Persistent Suggestion Store
+SQLite (WAL mode) backing for the suggestion cache so new sessions start warm.
+
+Rows are keyed by (model, normalized prefix, context), where context is ""
+or a hash of the working directory. Reads happen once at startup into the
+in-memory SuggestionCache, so the prompt thread never touches the database;
+writes are queued to a single background writer that also compacts the
+table (expired rows first, then the least recently written beyond max_entries).
+"""
+
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "cliffy"
+)
+
+def make_private(path):
+    """Create the database's directory (0700) and file (0600), tightening existing ones.
+
+    SQLite gives the -wal and -shm files the database file's mode.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    os.chmod(directory, 0o700)
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.chmod(path + suffix, 0o600)
+        except FileNotFoundError:
+            pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS suggestions (
+    model      TEXT NOT NULL,
+    prefix     TEXT NOT NULL,
+    context    TEXT NOT NULL,
+    suggestion TEXT NOT NULL,
+    updated    REAL NOT NULL,
+    PRIMARY KEY (model, prefix, context)
+)
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prefix(text):
+    """Collapse whitespace runs and drop leading whitespace."""
+    return _WHITESPACE.sub(" ", text.lstrip())
+
+
+def context_hash(cwd):
+    """Short, stable hash identifying a working directory."""
+    return hashlib.sha1(cwd.encode("utf-8", "surrogateescape")).hexdigest()[:16]
+
+
+class SuggestionStore:
+    """Persistent (model, prefix, context) -> suggestion store."""
+
+    COMPACT_EVERY = 200  # writes between compactions
+
+    def __init__(self, path, model, ttl=7 * 24 * 3600, max_entries=5000, use_cwd_context=False):
+        self.path = path
+        self.model = model
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.use_cwd_context = use_cwd_context
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writes_since_compact = 0
+
+    def _connect(self):
+        make_private(self.path)
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SCHEMA)
+        return conn
+
+    def current_context(self):
+        if not self.use_cwd_context:
+            return ""
+        try:
+            return context_hash(os.getcwd())
+        except OSError:
+            return ""
+
+    def load(self, limit):
+        """Return up to limit unexpired (prefix, suggestion) pairs, most recent first."""
+        contexts = {"", self.current_context()}
+        placeholders = ",".join("?" for _ in contexts)
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT prefix, suggestion FROM suggestions "
+                f"WHERE model = ? AND context IN ({placeholders}) AND updated >= ? "
+                f"ORDER BY updated DESC LIMIT ?",
+                (self.model, *contexts, time.time() - self.ttl, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+        return rows
+
+    def put(self, prefix, suggestion):
+        """Queue a suggestion for persistence (non-blocking)."""
+        if not suggestion:
+            return
+        self._ensure_writer()
+        self._queue.put((normalize_prefix(prefix), suggestion, self.current_context(), time.time()))
+
+    def close(self, timeout=2.0):
+        """Flush pending writes and stop the writer thread."""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join(timeout)
+        self._writer = None
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="cliffy-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        try:
+            conn = self._connect()
+            self._compact(conn)
+        except sqlite3.Error:
+            return  # Persistence is best-effort; the in-memory cache still works
+        try:
+            while True:
+                item = self._queue.get()
+                batch = [item]
+                # Drain whatever else is queued so bursts commit together
+                while item is not None:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+                rows = []
+                for entry in batch:
+                    if entry is None:
+                        continue
+                    prefix, suggestion, context, now = entry
+                    rows.append((self.model, prefix, context, suggestion, now))
+                if rows:
+                    try:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO suggestions "
+                            "(model, prefix, context, suggestion, updated) VALUES (?, ?, ?, ?, ?)",
+                            rows,
+                        )
+                        conn.commit()
+                        self._writes_since_compact += len(rows)
+                        if self._writes_since_compact >= self.COMPACT_EVERY:
+                            self._compact(conn)
+                    except sqlite3.Error:
+                        conn.rollback()  # Another session holds the lock; drop this batch
+                if None in batch:
+                    return
+        finally:
+            conn.close()
+
+    def _compact(self, conn):
+        """Drop expired rows, then the least recently written beyond max_entries."""
+        self._writes_since_compact = 0
+        conn.execute("DELETE FROM suggestions WHERE updated < ?", (time.time() - self.ttl,))
+        conn.execute(
+            "DELETE FROM suggestions WHERE rowid IN ("
+            "SELECT rowid FROM suggestions ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        conn.commit()
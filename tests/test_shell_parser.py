@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pattern_matcher import find_ai_triggers, find_destructive_patterns
+from shell_parser import parse_command
+
+
+def flagged(cmd):
+    analysis = parse_command(cmd).analysis_text()
+    return bool(find_destructive_patterns(analysis) or find_ai_triggers(analysis))
+
+
+@pytest.mark.parametrize("cmd", [
+    'echo "$(rm -rf /)"',
+    'echo "`rm -rf ~`"',
+    'echo "rm -rf ~" | bash',
+    'printf "rm -rf /" | sh',
+    'echo "DROP TABLE users;" | mysql prod',
+    'cat "rm -rf ~" | python3',
+    'echo "DROP DATABASE app;" | psql',
+    'git -c core.pager="rm -rf ~" log',
+    'git config alias.x "!rm -rf ~"',
+    'man -P "rm -rf ~" ls',
+    'git rebase --exec "rm -rf ~" HEAD~3',
+    'rg --pre "rm -rf ~" pattern',
+])
+def test_substitutions_and_piped_data_are_not_blanked(cmd):
+    assert flagged(cmd)
+
+
+@pytest.mark.parametrize("cmd", [
+    'git commit -m "rm -rf the old build dir"',
+    'git commit --message="rm -rf the old build dir"',
+    'git log --grep "DROP TABLE"',
+    'grep -rn "DROP TABLE" src/ | wc -l',
+    'echo "rm -rf is dangerous" | less',
+])
+def test_quoted_data_arguments_are_blanked(cmd):
+    assert not flagged(cmd)
@@ -0,0 +1,27 @@
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubServer
+
+
+def test_reused_connection_keeps_configured_latency():
+    stub = StubServer(latency="fixed:20")
+    url = stub.start()
+    body = {"model": "stub", "messages": [{"role": "user", "content": "Complete this shell command: git st"}]}
+    try:
+        with requests.Session() as session:
+            timings = []
+            for _ in range(5):
+                start = time.perf_counter()
+                response = session.post(f"{url}/chat/completions", json=body, timeout=5)
+                timings.append(time.perf_counter() - start)
+                assert response.status_code == 200
+    finally:
+        stub.stop()
+    # The first request opens the connection; later ones reuse it
+    assert max(timings[1:]) < 0.035, timings
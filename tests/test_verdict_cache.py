@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from verdict_cache import VerdictCache, command_shape
+
+
+@pytest.mark.parametrize("harmless, destructive", [
+    ('bash -c "cp a.txt b.txt"', 'bash -c "mv /srv/db /dev/null"'),
+    ('sh -c "ls -la build/"', 'sh -c "rm -rf build/"'),
+    ('ssh prod "cp a.txt b.txt"', 'ssh prod "mv /srv/db /dev/null"'),
+    ('eval "ls src/main.py"', 'eval "rm -rf src/main.py"'),
+    ('bash -c "cp a.txt b.txt"', 'bash -c cp a.txt b.txt'),
+])
+def test_script_arguments_do_not_share_a_shape(harmless, destructive):
+    assert command_shape(harmless) != command_shape(destructive)
+
+
+def test_file_paths_are_abstracted():
+    assert command_shape("cp notes.txt backup/") == command_shape("cp todo.md old/")
+    assert command_shape("rm /etc/a/b") != command_shape("rm /tmp/a/b")
+
+
+def test_cached_safe_verdict_does_not_approve_a_different_script(tmp_path):
+    cache = VerdictCache(str(tmp_path / "verdicts.db"), "model")
+    cache.put('bash -c "cp a.txt b.txt"', "SAFE", "SAFE")
+    assert cache.get('bash -c "mv /srv/db /dev/null"') is None
+    assert cache.get('bash -c "cp a.txt b.txt"') == ("SAFE", "SAFE")
@@ -0,0 +1,197 @@
+"""
+Cliffy Safety Verdict Cache
+Persistent SAFE/DANGEROUS verdicts from the AI safety stage, keyed by the
+shape of a command rather than its exact text.
+
+A shape keeps the command names, prefixes (sudo, env), options, operators
+and redirection operators, and abstracts file paths (anything with a "/"
+or an extension) and numbers, so "cp notes.txt backup/" and
+"cp todo.md old/" share a verdict. Bare words stay literal because they
+are usually subcommands ("docker rm" is not "docker ps"). Locations
+that change what a command means are never abstracted: "/", "~", "..",
+dotfiles, globs, variables and substitutions stay literal, and absolute
+paths keep their top-level directory ("/etc/<path>" is not "/tmp/<path>").
+Arguments that are not a single path-like token (bash -c / ssh / eval
+scripts, anything with spaces or shell syntax) are kept verbatim.
+"""
+
+import re
+import shlex
+import sqlite3
+import threading
+import time
+
+from shell_parser import parse_command
+from suggestion_store import make_private
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    model    TEXT NOT NULL,
+    shape    TEXT NOT NULL,
+    verdict  TEXT NOT NULL,
+    reason   TEXT NOT NULL,
+    created  REAL NOT NULL,
+    hits     INTEGER NOT NULL DEFAULT 0,
+    last_hit REAL,
+    PRIMARY KEY (model, shape)
+)
+"""
+
+_NUMBER = re.compile(r"^[+-]?\d+(\.\d+)?[kKmMgGtT%]?$")
+_WORD = re.compile(r"^[A-Za-z0-9_@:+-]+$")
+# Only single path-like tokens are abstracted; script strings (bash -c "...") stay literal
+_PATH_TOKEN = re.compile(r"^[A-Za-z0-9_@%+=:,./-]+$")
+_NEEDS_QUOTES = re.compile(r"[\s'\"]")
+
+
+def _abstract(arg):
+    if _NUMBER.match(arg):
+        return "<n>"
+    if arg.startswith("~/") and len(arg) > 2:
+        return "~/" + _abstract(arg[2:])
+    if not _PATH_TOKEN.match(arg):
+        return shlex.quote(arg) if _NEEDS_QUOTES.search(arg) else arg
+    if arg.startswith("-") or arg.startswith(".") or arg in ("/", ".", ".."):
+        return arg
+    key, eq, value = arg.partition("=")
+    if eq and _WORD.match(key):
+        return f"{key}={_abstract(value)}"
+    if _WORD.match(arg) or ".." in arg.split("/"):
+        return arg  # Subcommands and bare words (push, delete, czf) carry meaning
+    if arg.startswith("/"):
+        top = arg.strip("/").split("/", 1)[0]
+        return f"/{top}/<path>" if "/" in arg.strip("/") else f"/{top}"
+    return "<path>"
+
+
+def command_shape(cmd):
+    """Normalized shape of a command line used as the cache key."""
+    parsed = parse_command(cmd.strip())
+    parts = []
+    for index, pipeline in enumerate(parsed.pipelines):
+        for position, seg in enumerate(pipeline):
+            if position:
+                parts.append("|")
+            words = [f"{name}=<v>" for name, _ in seg.assignments]
+            words.extend(seg.prefixes)
+            if seg.command:
+                words.append(seg.command)
+            words.extend(_abstract(arg) for arg in seg.args)
+            for redirect in seg.redirects:
+                words.append(f"{redirect.fd or ''}{redirect.op}{_abstract(redirect.target) if redirect.target else ''}")
+            parts.append(" ".join(words))
+        if index < len(parsed.operators):
+            parts.append(parsed.operators[index].replace("\n", ";"))
+    return " ".join(parts)
+
+
+class VerdictCache:
+    """(model, command shape) -> (verdict, reason) with TTL and hit counts."""
+
+    def __init__(self, path, model, ttl=24 * 3600):
+        self.path = path
+        self.model = model
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            make_private(self.path)
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SCHEMA)
+        return self._conn
+
+    def get(self, cmd):
+        """Return (verdict, reason) for an unexpired entry, or None."""
+        shape = command_shape(cmd)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT verdict, reason FROM verdicts WHERE model = ? AND shape = ? AND created >= ?",
+                    (self.model, shape, now - self.ttl),
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE verdicts SET hits = hits + 1, last_hit = ? WHERE model = ? AND shape = ?",
+                        (now, self.model, shape),
+                    )
+                    conn.commit()
+            except sqlite3.Error:
+                row = None
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return tuple(row) if row else None
+
+    def put(self, cmd, verdict, reason=""):
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO verdicts (model, shape, verdict, reason, created, hits) "
+                    "VALUES (?, ?, ?, ?, ?, 0)",
+                    (self.model, command_shape(cmd), verdict, reason, time.time()),
+                )
+                conn.execute("DELETE FROM verdicts WHERE created < ?", (time.time() - self.ttl,))
+                conn.commit()
+            except sqlite3.Error:
+                pass  # Best-effort; the AI is simply asked again next time
+
+    def invalidate(self, cmd=None):
+        """Forget the verdict for cmd's shape, or every verdict when cmd is None.
+
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            try:
+                conn = self._connect()
+                if cmd is None:
+                    cursor = conn.execute("DELETE FROM verdicts WHERE model = ?", (self.model,))
+                else:
+                    cursor = conn.execute(
+                        "DELETE FROM verdicts WHERE model = ? AND shape = ?",
+                        (self.model, command_shape(cmd)),
+                    )
+                conn.commit()
+                return cursor.rowcount
+            except sqlite3.Error:
+                return 0
+
+    def stats(self, top=5):
+        """Session hit/miss counts plus stored entries and the most reused shapes."""
+        with self._lock:
+            try:
+                conn = self._connect()
+                entries = conn.execute(
+                    "SELECT COUNT(*) FROM verdicts WHERE model = ? AND created >= ?",
+                    (self.model, time.time() - self.ttl),
+                ).fetchone()[0]
+                busiest = conn.execute(
+                    "SELECT shape, verdict, hits FROM verdicts WHERE model = ? AND hits > 0 "
+                    "ORDER BY hits DESC LIMIT ?",
+                    (self.model, top),
+                ).fetchall()
+            except sqlite3.Error:
+                entries, busiest = 0, []
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "top": busiest,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None